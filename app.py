@@ -1,7 +1,9 @@
-from fyyur import app
+from fyyur import create_app
 import logging
 from logging import Formatter, FileHandler
 
+app = create_app()
+
 
 if not app.debug:
     file_handler = FileHandler('error.log')
@@ -15,12 +17,10 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    
-    app.run(debug=True)
+    # DEBUG comes from the FYYUR_ENV profile (see config.py).
+    app.run()
 
-# Or specify port manually:
-'''
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-'''
+# In production run the app under gunicorn instead (settings in
+# gunicorn.conf.py):
+#
+#     SECRET_KEY=... gunicorn app:app
@@ -0,0 +1,59 @@
+"""Sequential versus concurrent queries in the async views.
+
+    python -m benchmarks.async_views --database postgresql://localhost/fyyur_bench
+
+Starts the app in-process like :mod:`benchmarks.load`, with the
+``--profile`` configuration (default ``production``; the database is
+seeded by :mod:`benchmarks.datagen`, so point ``--database`` at a
+throwaway one), turns the response cache off and runs the same traffic
+over the detail and search pages twice: with ``ASYNC_QUERIES`` off, so a
+page's statements run one after another, and with it on, so they run
+concurrently on the async engine. Compare req/s and the percentiles
+between the two tables at each concurrency level.
+
+The async path opens a connection per statement (see :mod:`fyyur.aio`),
+so against a local SQLite file it mostly measures that overhead; the
+gain shows against a networked PostgreSQL where every round trip costs.
+"""
+import argparse
+import os
+import sys
+
+from benchmarks import load
+
+MIX = "venue=35,artist=35,search_venues=15,search_artists=15"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database", help="SQLAlchemy URL (default: temporary SQLite file)")
+    parser.add_argument("--scale", type=float, default=1, help="datagen scale of the catalogue")
+    parser.add_argument("--mix", default=MIX, help="weighted traffic mix (default: %(default)s)")
+    parser.add_argument("--concurrency", default="1,10,50",
+                        help="comma-separated numbers of simultaneous users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--profile", default="production", choices=load.PROFILES,
+                        help="FYYUR_ENV configuration of the local app (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    app, host, port = load._start_local_app(args.scale, args.profile)
+
+    from fyyur.cache import cache
+
+    app.config.update(CACHE_BACKEND="null")
+    cache.init_app(app)
+
+    mix = load._parse_mix(args.mix)
+    ids = load._ids(args.scale)
+    for async_queries in (False, True):
+        app.config["ASYNC_QUERIES"] = async_queries
+        print("\n#### ASYNC_QUERIES = %s" % async_queries)
+        for users in (int(level) for level in args.concurrency.split(",")):
+            load.run_level(host, port, mix, ids, users, args.duration)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
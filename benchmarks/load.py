@@ -0,0 +1,225 @@
+"""Concurrent load harness.
+
+    python -m benchmarks.load --concurrency 10,50,200 --duration 20
+    python -m benchmarks.load --url http://localhost:8000 --mix venues=5,shows=2
+
+Without ``--url`` the app is started in-process on a threaded WSGI server,
+with the ``--profile`` configuration (default ``production``), against
+``DATABASE_URL`` (default: a temporary SQLite file) seeded by
+:mod:`benchmarks.datagen`; with ``--url`` the target is expected to hold
+a catalogue generated at the same ``--scale``. Simulated users pick
+requests from the weighted ``--mix`` and fire them back-to-back for
+``--duration`` seconds at each concurrency level. For every level the
+harness prints throughput and p50/p95/p99 latency per route, plus the
+change in DB pool checkout wait reported by ``/metrics``
+(``fyyur_db_pool_checkout_wait_seconds``): as concurrency outgrows the
+pool, the mean wait climbs and latency follows it. Pool wait is only
+reported for pooled (non-SQLite) databases.
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.client import HTTPConnection
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_MIX = "venues=30,artist=30,shows=20,search_venues=8,search_artists=7,create_show=5"
+SEARCH_TERMS = ["Blue", "Hall", "Velvet", "Club", "Neon", "Trio", "City 1"]
+PROFILES = ("development", "testing", "production")
+POOL_WAIT = re.compile(r"^fyyur_db_pool_checkout_wait_seconds_(sum|count) (\S+)$", re.M)
+
+
+def _request(kind, rng, venue_ids, artist_ids):
+    """Return ``(method, path, form)`` for one request of the given kind."""
+    if kind == "venues":
+        return "GET", "/venues", None
+    if kind == "venue":
+        return "GET", "/venues/%d" % rng.choice(venue_ids), None
+    if kind == "artist":
+        return "GET", "/artists/%d" % rng.choice(artist_ids), None
+    if kind == "shows":
+        return "GET", "/shows", None
+    if kind == "search_venues":
+        return "POST", "/venues/search", {"search_term": rng.choice(SEARCH_TERMS)}
+    if kind == "search_artists":
+        return "POST", "/artists/search", {"search_term": rng.choice(SEARCH_TERMS)}
+    if kind == "create_show":
+        start_time = datetime.utcnow() + timedelta(days=rng.randint(1, 365))
+        return "POST", "/shows/create", {
+            "venue_id": rng.choice(venue_ids),
+            "artist_id": rng.choice(artist_ids),
+            "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    raise ValueError("unknown request kind %r" % kind)
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+class _User(threading.Thread):
+    def __init__(self, host, port, mix, ids, deadline, seed):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.kinds, self.weights = zip(*mix.items())
+        self.ids = ids
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def run(self):
+        connection = HTTPConnection(self.host, self.port, timeout=60)
+        while time.monotonic() < self.deadline:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            method, path, form = _request(kind, self.rng, *self.ids)
+            body = urlencode(form) if form else None
+            headers = {"Content-Type": "application/x-www-form-urlencoded"} if form else {}
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except OSError:
+                self.errors[kind] += 1
+                connection.close()
+                connection = HTTPConnection(self.host, self.port, timeout=60)
+                continue
+            elapsed = time.perf_counter() - start
+            if response.status >= 500:
+                self.errors[kind] += 1
+            else:
+                self.samples[kind].append(elapsed)
+        connection.close()
+
+
+def _pool_wait(host, port):
+    connection = HTTPConnection(host, port, timeout=10)
+    try:
+        connection.request("GET", "/metrics")
+        text = connection.getresponse().read().decode()
+    except OSError:
+        return None
+    finally:
+        connection.close()
+    values = dict(POOL_WAIT.findall(text))
+    if not values:
+        return None
+    return float(values["sum"]), float(values["count"])
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_level(host, port, mix, ids, users, duration):
+    before = _pool_wait(host, port)
+    deadline = time.monotonic() + duration
+    threads = [_User(host, port, mix, ids, deadline, seed) for seed in range(users)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    after = _pool_wait(host, port)
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    for thread in threads:
+        for kind, values in thread.samples.items():
+            samples[kind].extend(values)
+        for kind, count in thread.errors.items():
+            errors[kind] += count
+
+    total = sum(len(values) for values in samples.values())
+    print("\n== %d concurrent users, %.1fs: %.1f req/s, %d errors" % (
+        users, elapsed, total / elapsed, sum(errors.values())))
+    print("%-16s %8s %9s %9s %9s %9s %7s" % ("route", "count", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors"))
+    for kind in sorted(set(samples) | set(errors)):
+        ordered = sorted(samples[kind]) or [0.0]
+        print("%-16s %8d %9.1f %9.1f %9.1f %9.1f %7d" % (
+            kind,
+            len(samples[kind]),
+            len(samples[kind]) / elapsed,
+            _percentile(ordered, 0.50) * 1000,
+            _percentile(ordered, 0.95) * 1000,
+            _percentile(ordered, 0.99) * 1000,
+            errors[kind],
+        ))
+    if before and after and after[1] > before[1]:
+        waited = (after[0] - before[0]) / (after[1] - before[1])
+        print("pool checkout wait: %.2f ms mean over %d checkouts" % (
+            waited * 1000, after[1] - before[1]))
+
+
+def _start_local_app(scale, profile):
+    from werkzeug.serving import make_server
+
+    if "DATABASE_URL" not in os.environ:
+        workdir = tempfile.mkdtemp(prefix="fyyur-load-")
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "load.db")
+    # production reads it from the environment; nothing signed here leaves
+    # the process
+    os.environ.setdefault("SECRET_KEY", "fyyur-benchmark-key")
+
+    from fyyur import create_app, db
+    from benchmarks.datagen import generate
+
+    app = create_app(profile)
+    app.config.update(SLOW_REQUEST_MS=float("inf"))
+    with app.app_context():
+        db.create_all()
+        generate(scale)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return app, host, port
+
+
+def _ids(scale):
+    from benchmarks.datagen import ARTISTS, VENUES
+
+    # datagen assigns ids from 1 upwards on a fresh database
+    return list(range(1, int(scale * VENUES) + 1)), list(range(1, int(scale * ARTISTS) + 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="base URL of a running app (default: start one locally)")
+    parser.add_argument("--scale", type=float, default=1, help="datagen scale of the catalogue")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted traffic mix (default: %(default)s)")
+    parser.add_argument("--concurrency", default="1,10,50,100",
+                        help="comma-separated numbers of simultaneous users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--profile", default="production", choices=PROFILES,
+                        help="FYYUR_ENV configuration of the local app (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        _, host, port = _start_local_app(args.scale, args.profile)
+    mix = _parse_mix(args.mix)
+    ids = _ids(args.scale)
+    for users in (int(level) for level in args.concurrency.split(",")):
+        run_level(host, port, mix, ids, users, args.duration)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
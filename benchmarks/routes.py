@@ -0,0 +1,215 @@
+"""Route benchmarks for every view in ``fyyur/controller.py``.
+
+    python -m benchmarks.routes --scale 5 --output benchmarks/results/HEAD.json
+    python -m benchmarks.routes --scale 5 --compare benchmarks/results/main.json
+
+The app runs with the ``--profile`` configuration (default
+``production``, as deployed) against a throwaway SQLite database (or
+``--database``) seeded by :mod:`benchmarks.datagen`. Each route is requested through the
+Flask test client ``--repeat`` times with the response cache disabled and
+no conditional headers, so every request does the full work. Results are
+written as JSON keyed by ``"METHOD endpoint"`` with the median and p95
+latency and the query count reported by the ``Server-Timing`` header;
+``--compare`` prints the change against an earlier result file and exits
+with status 1 when a route got slower than ``--tolerance`` allows or runs
+more queries than before.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import url_for
+
+PROFILES = ("development", "testing", "production")
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def _form_data(endpoint, venue_id, artist_id):
+    venue = {
+        "name": "Bench Venue",
+        "city": "City 0",
+        "state": "CA",
+        "address": "1 Bench St",
+        "phone": "555-0000",
+        "genres": "Jazz",
+        "facebook_link": "https://facebook.com/bench",
+    }
+    artist = {
+        "name": "Bench Artist",
+        "city": "City 0",
+        "state": "CA",
+        "phone": "555-0000",
+        "genres": "Jazz",
+        "facebook_link": "https://facebook.com/bench",
+    }
+    return {
+        "search_venues": {"search_term": "Blue"},
+        "search_artists": {"search_term": "Blue"},
+        "create_venue_submission": venue,
+        "edit_venue_submission": venue,
+        "create_artist_submission": artist,
+        "edit_artist_submission": artist,
+        "create_show_submission": {
+            "venue_id": str(venue_id),
+            "artist_id": str(artist_id),
+            "start_time": (datetime.utcnow() + timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    }.get(endpoint, {})
+
+
+def _cases(app, venue_id, artist_id):
+    """Yield ``(name, method, url, form)`` for every controller view."""
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        view = app.view_functions[rule.endpoint]
+        if view.__module__ != "fyyur.controller":
+            continue
+        values = {
+            argument: venue_id if argument == "venue_id" else artist_id
+            for argument in rule.arguments
+        }
+        with app.test_request_context():
+            url = url_for(rule.endpoint, **values)
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            yield (
+                "%s %s" % (method, rule.endpoint),
+                method,
+                url,
+                _form_data(rule.endpoint, venue_id, artist_id),
+            )
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(scale, repeat, database=None, profile="production"):
+    if database is None:
+        workdir = tempfile.mkdtemp(prefix="fyyur-bench-")
+        database = "sqlite:///" + os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = database
+    # production reads it from the environment; nothing signed here leaves
+    # the process
+    os.environ.setdefault("SECRET_KEY", "fyyur-benchmark-key")
+
+    from fyyur import create_app, db
+    from fyyur.cache import cache
+    from fyyur.model import Artist, Venue
+    from benchmarks.datagen import generate
+
+    app = create_app(profile)
+    app.config.update(CACHE_BACKEND="null", SLOW_REQUEST_MS=float("inf"))
+    cache.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        sizes = generate(scale)
+        venue_id = db.session.query(Venue.id).order_by(Venue.id).first()[0]
+        artist_id = db.session.query(Artist.id).order_by(Artist.id).first()[0]
+
+    client = app.test_client()
+    results = {}
+    for name, method, url, form in _cases(app, venue_id, artist_id):
+        samples = []
+        queries = None
+        for _ in range(repeat):
+            if name == "DELETE delete_venue":
+                # each iteration deletes a fresh venue without shows
+                with app.app_context():
+                    disposable = Venue(name="Disposable", city="x", state="CA", genres=[])
+                    db.session.add(disposable)
+                    db.session.commit()
+                    url = "/venues/%d" % disposable.id
+            start = time.perf_counter()
+            response = client.open(url, method=method, data=form)
+            # streamed pages render while their body is read
+            response.get_data()
+            samples.append(time.perf_counter() - start)
+            response.close()
+            match = QUERIES.search(response.headers.get("Server-Timing", ""))
+            queries = int(match.group(1)) if match else None
+        results[name] = {
+            "status": response.status_code,
+            "median_ms": round(_percentile(samples, 0.5) * 1000, 3),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+            "queries": queries,
+        }
+
+    return {
+        "commit": _commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "database": database.split(":", 1)[0],
+        "profile": profile,
+        "scale": scale,
+        "repeat": repeat,
+        "rows": dict(zip(("venues", "artists", "shows"), sizes)),
+        "routes": results,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    print("%-36s %10s %10s %8s %9s" % ("route", "base ms", "now ms", "change", "queries"))
+    for name, now in sorted(current["routes"].items()):
+        before = baseline["routes"].get(name)
+        if before is None:
+            print("%-36s %10s %10.2f %8s %9s" % (name, "-", now["median_ms"], "new", now["queries"]))
+            continue
+        change = (now["median_ms"] - before["median_ms"]) / max(before["median_ms"], 0.001)
+        queries = "%s->%s" % (before["queries"], now["queries"])
+        print(
+            "%-36s %10.2f %10.2f %+7.0f%% %9s"
+            % (name, before["median_ms"], now["median_ms"], change * 100, queries)
+        )
+        if change > tolerance or (now["queries"] or 0) > (before["queries"] or 0):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database", help="SQLAlchemy URL (default: temporary SQLite file)")
+    parser.add_argument("--profile", default="production", choices=PROFILES,
+                        help="FYYUR_ENV configuration to measure (default: %(default)s)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed median slowdown before failing (default 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.scale, args.repeat, args.database, args.profile)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("regressions: " + ", ".join(regressions))
+            return 1
+    else:
+        json.dump(results["routes"], sys.stdout, indent=2, sort_keys=True)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Cold-start benchmark: import time and time to the first response.
+
+    python -m benchmarks.startup --repeat 10 --output benchmarks/results/startup.json
+    python -m benchmarks.startup --compare benchmarks/results/startup.json
+
+Each run starts a fresh interpreter that imports ``fyyur``, builds the app
+with ``create_app()`` and requests ``/`` and ``/venues`` through the test
+client against an empty SQLite database, so the numbers cover the
+imports, app set-up and the first template compilations a new worker
+goes through. The median of ``--repeat`` runs is reported per phase;
+``--compare`` exits with status 1 when a phase got slower than
+``--tolerance`` allows. ``--profile`` passes ``FYYUR_ENV`` to the child,
+e.g. ``production`` to measure with precompiled templates.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, time
+start = time.perf_counter()
+import fyyur
+imported = time.perf_counter()
+app = fyyur.create_app()
+created = time.perf_counter()
+with app.app_context():
+    fyyur.db.create_all()
+client = app.test_client()
+ready = time.perf_counter()
+client.get("/")
+client.get("/venues")
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_requests_ms": (served - ready) * 1000,
+    "total_ms": (served - start) * 1000,
+}))
+"""
+
+
+def run(repeat, profile):
+    workdir = tempfile.mkdtemp(prefix="fyyur-startup-")
+    env = dict(os.environ, SECRET_KEY=os.environ.get("SECRET_KEY", "startup-benchmark"))
+    env["DATABASE_URL"] = env["TEST_DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "startup.db")
+    if profile:
+        env["FYYUR_ENV"] = profile
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", CHILD], env=env, text=True)
+        samples.append(json.loads(output.splitlines()[-1]))
+    return {
+        phase: round(statistics.median(sample[phase] for sample in samples), 1)
+        for phase in samples[0]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--profile", help="FYYUR_ENV for the measured process")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed slowdown per phase before failing (default 0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.profile)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    slower = []
+    print("%-20s %10s %10s" % ("phase", "base ms", "now ms"))
+    for phase, now in results.items():
+        before = baseline.get(phase)
+        print("%-20s %10s %10.1f" % (phase, "-" if before is None else "%.1f" % before, now))
+        if before and (now - before) / before > args.tolerance:
+            slower.append(phase)
+    if slower:
+        print("regressions: " + ", ".join(slower))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
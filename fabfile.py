@@ -13,6 +13,13 @@ def test():
         abort("Aborted at user request.")
 
 
+def bench(scale=1, baseline=None):
+    command = "python -m benchmarks.routes --scale {} --output benchmarks/results/latest.json".format(scale)
+    if baseline:
+        command += " --compare {}".format(baseline)
+    local(command)
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
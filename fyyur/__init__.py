@@ -1,13 +1,72 @@
+import os
+import weakref
+
+import click
 from flask import Flask
-from flask_moment import Moment
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-
-# App Config.
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-from . import controller
\ No newline at end of file
+
+import config
+from . import routing
+
+db = routing.RoutingSQLAlchemy()
+
+# apps built in this process, without keeping them alive
+_apps = weakref.WeakSet()
+
+
+def _dispose_engines():
+    # A forked worker must not reuse the parent's pooled connections;
+    # drop them without closing, the parent still owns the sockets.
+    for app in list(_apps):
+        for bind in [None, *app.config['SQLALCHEMY_BINDS']]:
+            db.get_engine(app, bind=bind).dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_engines)
+
+
+def create_app(profile=None):
+    """Build the app for ``profile`` (default: the ``FYYUR_ENV`` variable)."""
+    app = Flask(__name__)
+    app.config.from_object(config.profiles[profile or os.environ.get('FYYUR_ENV', 'development')])
+    if not app.config['SECRET_KEY']:
+        raise RuntimeError('SECRET_KEY must be set in the environment')
+    db.init_app(app)
+
+    # Alembic takes longer to import than the rest of the app together, and
+    # only the `flask db` commands need it: register them when the app is
+    # built by the Flask CLI (inside a click command) or MIGRATE asks for it.
+    if app.config['MIGRATE'] or click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    _apps.add(app)
+
+    routing.init_app(app)
+
+    from . import instrumentation
+    instrumentation.init_app(app)
+
+    from .cache import cache
+    cache.init_app(app)
+
+    from . import metrics
+    metrics.init_app(app)
+
+    from . import datefmt
+    datefmt.init_app(app)
+
+    from . import assets
+    assets.init_app(app)
+
+    from . import compiled_templates
+    compiled_templates.init_app(app)
+
+    # counters has no init_app: importing it registers the Show mapper
+    # events that keep the venue and artist show counters up to date
+    from . import counters  # noqa: F401
+    from . import api, controller, cli
+    controller.init_app(app)
+    api.init_app(app)
+    cli.init_app(app)
+
+    return app
@@ -0,0 +1,136 @@
+"""Concurrent statements for the async read views.
+
+Views declared ``async def`` can ``await gather(*statements)`` to run a
+page's independent SELECTs at the same time, each on its own connection
+of an async engine (asyncpg for PostgreSQL, aiosqlite for SQLite). Rows
+come back as plain ``Row`` tuples, one list per statement, and reads are
+routed to the replica exactly like the session's (see
+:mod:`fyyur.routing`).
+
+Flask runs every async view through asgiref's ``async_to_sync``: each
+call starts a new event loop on a thread of its own while the worker
+thread that received the request waits for it, so:
+
+* the async engines use ``NullPool`` - pooled connections would belong to
+  a loop that is gone by the next request. Each statement opens its own
+  connection; put PgBouncer in front of PostgreSQL to keep that cheap.
+  They are created with ``ASYNC_ENGINE_OPTIONS``, which carries the
+  statement and connect timeouts of ``SQLALCHEMY_ENGINE_OPTIONS``.
+* an engine makes its first connection as it is created. That
+  connection initialises the dialect behind an asyncio lock, which
+  belongs to the loop that made it; requests arriving together on a
+  fresh engine would otherwise contend for it from other loops.
+* the connections open at once in a process are held to the pool's
+  ``pool_size + max_overflow``. A request waits up to ``pool_timeout``
+  for its share, and that wait is recorded as a pool checkout wait in
+  :mod:`fyyur.metrics`. The wait blocks the request's event loop thread;
+  nothing else runs on that loop, and no connection of the request is
+  open yet.
+* the worker thread is still held for the whole request. The gain is
+  latency: a page waits for its slowest query instead of the sum of all
+  of them. Serving more requests per worker needs an ASGI server.
+
+With ``ASYNC_QUERIES`` off, the default, the statements run one after
+another on the regular engine, which is cheaper against a local database.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from fyyur import db
+from fyyur.metrics import registry
+from fyyur.routing import REPLICA, reads_from_replica
+
+DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class _Slots:
+    """Connections an async engine may have open at once in this process."""
+
+    def __init__(self, size):
+        self.size = self.free = size
+        self.condition = threading.Condition()
+
+    def acquire(self, count, timeout):
+        start = time.perf_counter()
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.free >= count, timeout):
+                raise exc.TimeoutError(
+                    "no async connection free after %.1f seconds" % timeout
+                )
+            self.free -= count
+        registry.pool_checkout(time.perf_counter() - start)
+
+    def release(self, count):
+        with self.condition:
+            self.free += count
+            self.condition.notify_all()
+
+
+async def _async_engine(url):
+    with _engines_lock:
+        entry = _engines.get(url)
+        if entry is None:
+            config = current_app.config
+            sa_url = make_url(url)
+            sa_url = sa_url.set(drivername=DRIVERS[sa_url.get_backend_name()])
+            engine = create_async_engine(
+                sa_url, poolclass=NullPool, **config["ASYNC_ENGINE_OPTIONS"]
+            )
+            # the first connection initialises the dialect; other threads
+            # wait on the lock meanwhile, each on its own loop
+            async with engine.connect():
+                pass
+            options = config["SQLALCHEMY_ENGINE_OPTIONS"]
+            size = options.get("pool_size", 5) + options.get("max_overflow", 10)
+            entry = _engines[url] = (engine, _Slots(size), options.get("pool_timeout", 30))
+        return entry
+
+
+# a fork would copy slots held by the parent's requests
+os.register_at_fork(after_in_child=_engines.clear)
+
+
+def _bind():
+    return REPLICA if reads_from_replica() else None
+
+
+async def _fetch(engine, semaphore, statement):
+    async with semaphore:
+        async with engine.connect() as connection:
+            result = await connection.execute(statement)
+            return result.all()
+
+
+async def gather(*statements):
+    """Run ``statements`` concurrently and return their rows in order."""
+    bind = _bind()
+    if not current_app.config["ASYNC_QUERIES"]:
+        with db.get_engine(current_app, bind=bind).connect() as connection:
+            return [connection.execute(statement).all() for statement in statements]
+
+    if bind is None:
+        url = current_app.config["SQLALCHEMY_DATABASE_URI"]
+    else:
+        url = current_app.config["SQLALCHEMY_BINDS"][bind]
+    engine, slots, timeout = await _async_engine(url)
+    # with fewer slots than statements, the rest wait for a connection
+    count = min(len(statements), slots.size)
+    slots.acquire(count, timeout)
+    try:
+        semaphore = asyncio.Semaphore(count)
+        return await asyncio.gather(
+            *(_fetch(engine, semaphore, statement) for statement in statements)
+        )
+    finally:
+        slots.release(count)
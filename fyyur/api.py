@@ -0,0 +1,192 @@
+"""Versioned JSON read API.
+
+    GET /api/v1/venues?fields=id,name,city&limit=50&after=<cursor>
+    GET /api/v1/venues/<id>?include=shows
+    GET /api/v1/shows?include=artist,venue
+
+``fields`` names the columns to return (``id`` is always included) and
+becomes the column list of the SELECT, so nothing else is read. Lists
+are ordered by id and paged by keyset: ``next`` in a response is the
+``after`` of the following page, ``null`` on the last one. ``include``
+embeds related resources with one ``IN`` query per relation for the
+whole page: ``shows`` on venues and artists, ``artist`` and ``venue`` on
+shows. Embedded resources carry the summary fields in :data:`SUMMARY`;
+embedded show lists hold the latest ``EMBED_LIMIT`` shows of each item,
+newest first.
+
+Rows go from the cursor straight into dicts, which are encoded with
+``orjson`` when it is installed and ``json`` otherwise. Times are UTC.
+"""
+import json
+from datetime import datetime, timezone
+
+from flask import abort, current_app, request
+from sqlalchemy import func, select
+
+from fyyur import db
+from fyyur.instrumentation import query_budget
+from fyyur.model import Artist, Show, Venue
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PREFIX = "/api/v1"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+EMBED_LIMIT = 20
+
+RESOURCES = {"venues": Venue.__table__, "artists": Artist.__table__, "shows": Show.__table__}
+SUMMARY = {
+    "venues": ("id", "name", "city", "state", "image_link"),
+    "artists": ("id", "name", "city", "state", "image_link"),
+    "shows": ("id", "artist_id", "venue_id", "start_time"),
+}
+# include -> (embedded resource, column of the item, column of the
+# embedded rows it matches, whether a list is embedded)
+INCLUDES = {
+    "venues": {"shows": ("shows", "id", "venue_id", True)},
+    "artists": {"shows": ("shows", "id", "artist_id", True)},
+    "shows": {
+        "artist": ("artists", "artist_id", "id", False),
+        "venue": ("venues", "venue_id", "id", False),
+    },
+}
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc).isoformat()
+    raise TypeError(repr(value))
+
+
+def _dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NAIVE_UTC)
+    return json.dumps(payload, default=_default, separators=(",", ":"))
+
+
+def _response(payload, status=200):
+    return current_app.response_class(_dumps(payload), status, mimetype="application/json")
+
+
+def _fail(status, message):
+    abort(_response({"error": message}, status))
+
+
+def _names(argument, allowed, default):
+    value = request.args.get(argument)
+    if not value:
+        return list(default)
+    names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    for name in names:
+        if name not in allowed:
+            _fail(400, "unknown %s %r" % (argument.rstrip("s"), name))
+    return names
+
+
+def _select(table, names, *criteria, limit=None):
+    # the keyset cursor is an id, so pages must be in id order
+    statement = select(*(table.c[name] for name in names)).where(*criteria)
+    statement = statement.order_by(table.c.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return [dict(zip(names, row)) for row in db.session.execute(statement)]
+
+
+def _select_latest(table, names, remote, keys):
+    """Select the latest ``EMBED_LIMIT`` shows of each of ``keys``, newest first."""
+    newest = (table.c.start_time.desc(), table.c.id.desc())
+    rank = func.row_number().over(partition_by=table.c[remote], order_by=newest).label("rank")
+    ranked = (
+        select(*(table.c[name] for name in names), rank)
+        .where(table.c[remote].in_(keys))
+        .subquery()
+    )
+    statement = (
+        select(*(ranked.c[name] for name in names))
+        .where(ranked.c.rank <= EMBED_LIMIT)
+        .order_by(ranked.c[remote], ranked.c.rank)
+    )
+    return [dict(zip(names, row)) for row in db.session.execute(statement)]
+
+
+def _query(resource):
+    """Parse fields and include; return (columns to select, fields, includes)."""
+    table = RESOURCES[resource]
+    fields = _names("fields", table.c, table.c.keys())
+    if "id" not in fields:
+        fields.insert(0, "id")
+    includes = _names("include", INCLUDES[resource], ())
+    columns = list(fields)
+    for name in includes:
+        local = INCLUDES[resource][name][1]
+        if local not in columns:
+            columns.append(local)
+    return columns, fields, includes
+
+
+def _embed(resource, items, fields, includes):
+    for name in includes:
+        target, local, remote, many = INCLUDES[resource][name]
+        keys = {item[local] for item in items}
+        table = RESOURCES[target]
+        if not keys:
+            rows = []
+        elif many:
+            rows = _select_latest(table, SUMMARY[target], remote, keys)
+        else:
+            rows = _select(table, SUMMARY[target], table.c[remote].in_(keys))
+        if many:
+            embedded = {}
+            for row in rows:
+                embedded.setdefault(row[remote], []).append(row)
+            for item in items:
+                item[name] = embedded.get(item[local], [])
+        else:
+            embedded = {row[remote]: row for row in rows}
+            for item in items:
+                item[name] = embedded.get(item[local])
+    for item in items:
+        for column in set(item) - set(fields) - set(includes):
+            del item[column]
+
+
+@query_budget(3)
+def list_resources(resource):
+    table = RESOURCES[resource]
+    columns, fields, includes = _query(resource)
+    try:
+        limit = min(max(int(request.args.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        after = request.args.get("after")
+        after = int(after) if after else None
+    except ValueError:
+        _fail(400, "limit and after must be integers")
+
+    criteria = [] if after is None else [table.c.id > after]
+    # one row past the page tells whether there is a next one
+    items = _select(table, columns, *criteria, limit=limit + 1)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = str(items[-1]["id"])
+    _embed(resource, items, fields, includes)
+    return _response({"data": items, "next": next_cursor})
+
+
+@query_budget(3)
+def get_resource(resource, id):
+    table = RESOURCES[resource]
+    columns, fields, includes = _query(resource)
+    items = _select(table, columns, table.c.id == id)
+    if not items:
+        _fail(404, "no %s with id %d" % (resource.rstrip("s"), id))
+    _embed(resource, items, fields, includes)
+    return _response({"data": items[0]})
+
+
+def init_app(app):
+    kinds = "<any(%s):resource>" % ", ".join(RESOURCES)
+    app.add_url_rule("%s/%s" % (PREFIX, kinds), "api_list", list_resources)
+    app.add_url_rule("%s/%s/<int:id>" % (PREFIX, kinds), "api_get", get_resource)
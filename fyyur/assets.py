@@ -0,0 +1,157 @@
+"""Bundled, fingerprinted static assets.
+
+``flask build-assets`` concatenates and minifies the stylesheets and
+scripts of each bundle in :data:`BUNDLES`, copies the files in
+:data:`FILES`, and writes everything to ``static/dist/`` under names
+carrying a hash of the content (``app.3f9c2d1e4b5a.css``), next to
+``.gz`` and - when the ``brotli`` package is installed - ``.br`` copies
+and a ``manifest.json`` mapping each logical name to its output.
+
+Templates ask for ``asset_urls("app.css")`` (bundles) or
+``asset_url("img/front-splash.jpg")``. With ``ASSET_BUNDLES`` on and a
+manifest present they get the fingerprinted URLs; otherwise the source
+files are linked one by one, so development needs no build step.
+Fingerprinted files never change, so they are served with a one-year
+``immutable`` cache lifetime, precompressed when the client accepts it.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory, url_for
+
+BUNDLES = {
+    "app.css": [
+        "css/bootstrap.min.css",
+        "css/layout.main.css",
+        "css/main.css",
+        "css/main.responsive.css",
+        "css/main.quickfix.css",
+    ],
+    "head.js": [
+        "js/libs/modernizr-2.8.2.min.js",
+        "js/libs/moment.min.js",
+    ],
+    "app.js": [
+        "js/libs/jquery-1.11.1.min.js",
+        "js/libs/bootstrap-3.1.1.min.js",
+        "js/plugins.js",
+        "js/script.js",
+    ],
+}
+FILES = ["img/front-splash.jpg", "js/libs/respond-1.4.2.min.js"]
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _minify(name, text):
+    if name.endswith(".css"):
+        from rcssmin import cssmin
+
+        return cssmin(text)
+    # keep already minified libraries byte for byte
+    if name.endswith(".min.js"):
+        return text
+    from rjsmin import jsmin
+
+    return jsmin(text)
+
+
+def _write(directory, name, content):
+    stem, extension = os.path.splitext(name)
+    output = "%s.%s%s" % (stem, hashlib.sha256(content).hexdigest()[:12], extension)
+    path = os.path.join(directory, output)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(content)
+
+    if mimetypes.guess_type(name)[0] in ("text/css", "application/javascript", "text/javascript"):
+        with gzip.open(path + ".gz", "wb", compresslevel=9) as file:
+            file.write(content)
+        try:
+            import brotli
+        except ImportError:
+            pass
+        else:
+            with open(path + ".br", "wb") as file:
+                file.write(brotli.compress(content))
+    return "%s/%s" % (DIST, output.replace(os.sep, "/"))
+
+
+def build(static_folder):
+    """Build every bundle and file into ``static/dist/``; return the manifest."""
+    # Bundles sit directly in static/dist/, one level below static/ like
+    # css/ and js/, so relative url()s in the stylesheets keep resolving.
+    directory = os.path.join(static_folder, DIST)
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding="utf-8") as file:
+                parts.append(_minify(source, file.read()))
+        separator = "\n" if name.endswith(".css") else ";\n"
+        manifest[name] = _write(directory, name, separator.join(parts).encode("utf-8"))
+    for name in FILES:
+        with open(os.path.join(static_folder, name), "rb") as file:
+            manifest[name] = _write(directory, name, file.read())
+
+    with open(os.path.join(directory, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+def _manifest():
+    return current_app.extensions["fyyur_assets"]
+
+
+def asset_url(name):
+    output = _manifest().get(name)
+    return url_for("static", filename=output or name)
+
+
+def asset_urls(bundle):
+    output = _manifest().get(bundle)
+    if output:
+        return [url_for("static", filename=output)]
+    return [url_for("static", filename=source) for source in BUNDLES[bundle]]
+
+
+def _static(filename):
+    app = current_app
+    if not filename.startswith(DIST + "/"):
+        return app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.isfile(
+            os.path.join(app.static_folder, filename + suffix)
+        ):
+            response = send_from_directory(
+                app.static_folder, filename + suffix, mimetype=mimetype
+            )
+            response.content_encoding = encoding
+            break
+    else:
+        response = app.send_static_file(filename)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    response.cache_control.no_cache = None
+    return response
+
+
+def init_app(app):
+    manifest = {}
+    path = os.path.join(app.static_folder, DIST, MANIFEST)
+    if app.config["ASSET_BUNDLES"] and os.path.isfile(path):
+        with open(path) as file:
+            manifest = json.load(file)
+    app.extensions["fyyur_assets"] = manifest
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
+    app.view_functions["static"] = _static
@@ -0,0 +1,240 @@
+"""Response cache for the read routes.
+
+Views opt in with ``@cache.cached(*tags)``; tags are format strings over
+the view arguments (``"venue:{venue_id}"``). Every tag has a generation
+number that is folded into the cache key, so the write handlers
+invalidate precisely by bumping the generations of the tags they touch
+with :meth:`ResponseCache.invalidate`; stale entries are then never read
+again and age out through the LRU bound or their TTL.
+
+``CACHE_BACKEND`` selects the store:
+
+* ``"lru"`` - in-process, bounded by ``CACHE_MAX_ENTRIES``. Invalidation
+  only reaches the process that handled the write, so it is refused when
+  ``WORKERS`` is above one.
+* ``"redis"`` - shared by every worker through ``CACHE_REDIS_URL``
+  (needs the ``redis`` package).
+* ``"null"`` - caching disabled.
+
+Keys also carry ``g.render_variant`` (locale and time zone, see
+:mod:`fyyur.datefmt`), so each variant of a page is cached separately,
+and the ETag :mod:`fyyur.conditional` computed from the database for the
+request, so a page is never served from an entry rendered before its
+data changed, nor under an ETag that does not describe it.
+
+Only successful GET responses are stored. Streamed pages (see
+:mod:`fyyur.streaming`) are copied as they are sent and stored once the
+last chunk is out, unless they grow past ``CACHE_MAX_BODY_BYTES``.
+Requests carrying flashed messages bypass the cache so the messages are
+rendered and consumed.
+So do requests inside a client's read-your-writes window (see
+:mod:`fyyur.routing`), which must not be answered from a page rendered
+off the replica before their write.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from fyyur.routing import pinned_to_primary
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def generations(self, tags):
+        return [0] * len(tags)
+
+    def bump(self, tags):
+        pass
+
+
+class LRUBackend:
+    def __init__(self, max_entries, default_ttl):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        # generations live outside the LRU: evicting one would reset it
+        # and resurrect entries it had invalidated
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, tags):
+        with self._lock:
+            return [self._generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="fyyur:"):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self._client.setex(self.prefix + key, ttl, pickle.dumps(value))
+
+    def generations(self, tags):
+        values = self._client.mget([self.prefix + "gen:" + tag for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        pipeline = self._client.pipeline()
+        for tag in tags:
+            pipeline.incr(self.prefix + "gen:" + tag)
+        pipeline.execute()
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.default_ttl = 0
+        self.max_body = 0
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config["CACHE_BACKEND"]
+        self.default_ttl = app.config["CACHE_DEFAULT_TTL"]
+        self.max_body = app.config["CACHE_MAX_BODY_BYTES"]
+        if kind == "lru" and app.config["WORKERS"] > 1:
+            raise ValueError(
+                "the lru cache is per process; use CACHE_BACKEND redis or null "
+                "with %d workers" % app.config["WORKERS"]
+            )
+        if kind == "lru":
+            self.backend = LRUBackend(app.config["CACHE_MAX_ENTRIES"], self.default_ttl)
+        elif kind == "redis":
+            self.backend = RedisBackend(app.config["CACHE_REDIS_URL"])
+        elif kind == "null":
+            self.backend = NullBackend()
+        else:
+            raise ValueError("unknown CACHE_BACKEND %r" % kind)
+
+    def cached(self, *tags, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                run = current_app.ensure_sync(view)
+                if request.method != "GET" or "_flashes" in session or pinned_to_primary():
+                    return run(*args, **kwargs)
+
+                view_tags = [tag.format(**kwargs) for tag in tags]
+                generations = self.backend.generations(view_tags)
+                key = "view:%s:%s:%s:%s" % (
+                    g.get("render_variant", ""),
+                    g.get("etag", ""),
+                    request.full_path,
+                    ",".join(map(str, generations)),
+                )
+                stored = self.backend.get(key)
+                if stored is not None:
+                    self._record(hit=True)
+                    body, status, headers = stored
+                    return current_app.response_class(body, status, headers)
+
+                self._record(hit=False)
+                response = make_response(run(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                headers = [
+                    (name, value)
+                    for name, value in response.headers
+                    if name.lower() != "set-cookie"
+                ]
+
+                def store(body):
+                    self.backend.set(key, (body, 200, headers), ttl or self.default_ttl)
+
+                if response.is_streamed:
+                    response.response = self._tee(response.response, response.charset, store)
+                else:
+                    store(response.get_data())
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def _tee(self, chunks, charset, store):
+        body = []
+        size = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(charset)
+                if body is not None:
+                    size += len(chunk)
+                    body.append(chunk)
+                    if size > self.max_body:
+                        body = None
+                yield chunk
+        finally:
+            # closing the source ends the request context it keeps open
+            if hasattr(chunks, "close"):
+                chunks.close()
+        if body is not None:
+            store(b"".join(body))
+
+    def invalidate(self, *tags):
+        self.backend.bump(tags)
+
+    def _record(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+cache = ResponseCache()
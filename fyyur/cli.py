@@ -0,0 +1,156 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from fyyur import db
+
+
+@click.command("explain-routes")
+@with_appcontext
+def explain_routes():
+    """Report which indexes the hot routes' queries use (PostgreSQL only)."""
+    from fyyur.queryplans import NoSampleData, check_routes
+
+    if db.engine.dialect.name != "postgresql":
+        raise click.ClickException("query plans can only be checked on PostgreSQL")
+
+    failed = False
+    try:
+        for endpoint, url, used, missing in check_routes(current_app._get_current_object()):
+            status = "MISSING " + ", ".join(sorted(missing)) if missing else "ok"
+            click.echo("%-15s %-22s %s" % (endpoint, url, status))
+            click.echo("    uses: %s" % (", ".join(sorted(used)) or "no index"))
+            failed = failed or bool(missing)
+    except NoSampleData as error:
+        raise click.ClickException(str(error))
+    if failed:
+        raise SystemExit(1)
+
+
+@click.command("roll-show-counters")
+@with_appcontext
+def roll_show_counters():
+    """Move shows that have started from the upcoming to the past counts."""
+    from fyyur.counters import roll_forward
+
+    click.echo("%d shows rolled to past" % roll_forward())
+
+
+@click.command("rebuild-show-counters")
+@with_appcontext
+def rebuild_show_counters():
+    """Recount upcoming and past shows for every venue and artist."""
+    from fyyur.counters import rebuild
+
+    rebuild()
+
+
+@click.command("compile-templates")
+@click.option("--target", help="output directory (default: COMPILED_TEMPLATES_DIR)")
+@with_appcontext
+def compile_templates(target):
+    """Precompile every Jinja template for faster worker start-up."""
+    from fyyur.compiled_templates import compile_all
+
+    target = target or current_app.config["COMPILED_TEMPLATES_DIR"]
+    if not target:
+        raise click.ClickException("set COMPILED_TEMPLATES_DIR or pass --target")
+    count = compile_all(current_app._get_current_object(), target)
+    click.echo("%d templates compiled into %s" % (count, target))
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets():
+    """Bundle, minify, fingerprint and precompress the static assets."""
+    from fyyur.assets import build
+
+    for name, output in sorted(build(current_app.static_folder).items()):
+        click.echo("%-32s %s" % (name, output))
+
+
+@click.command("import-data")
+@click.argument("kind", type=click.Choice(["artists", "shows", "venues"]))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "format", type=click.Choice(["csv", "jsonl"]),
+              help="file format (default: from the file extension)")
+@click.option("--batch-size", default=5000, show_default=True, help="rows per transaction")
+@click.option("--rejects", type=click.Path(dir_okay=False, writable=True),
+              help="write the rejected rows to this JSON Lines file")
+@with_appcontext
+def import_data(kind, path, format, batch_size, rejects):
+    """Bulk-load venues, artists or shows from a CSV or JSON Lines file."""
+    import json
+    import time
+
+    from fyyur.importer import Importer, guess_format, read_records
+
+    format = format or guess_format(path)
+    if not format:
+        raise click.ClickException("pass --format, the file extension is not .csv or .jsonl")
+
+    shown = 0
+    output = open(rejects, "w") if rejects else None
+
+    def reject(line, reason, record):
+        nonlocal shown
+        if output:
+            output.write(json.dumps({"line": line, "error": reason, "record": record}) + "\n")
+        if shown < 10:
+            click.echo("line %d: %s" % (line, reason), err=True)
+            shown += 1
+
+    start = time.perf_counter()
+    importer = Importer(kind, batch_size, reject)
+    try:
+        with open(path, newline="", encoding="utf-8") as file:
+            imported, rejected = importer.run(read_records(file, format))
+    finally:
+        if output:
+            output.close()
+    importer.finish()
+    elapsed = time.perf_counter() - start
+    click.echo(
+        "%d %s imported, %d rejected in %.1f s (%d rows/s)"
+        % (imported, kind, rejected, elapsed, (imported + rejected) / elapsed)
+    )
+
+
+@click.command("export-data")
+@click.argument("kind", type=click.Choice(["artists", "shows", "venues"]))
+@click.option("--format", "format", type=click.Choice(["csv", "jsonl", "parquet"]),
+              default="csv", show_default=True)
+@click.option("--since", help="only rows updated at or after this ISO 8601 time")
+@click.option("--output", type=click.File("wb"), default="-",
+              help="output file (default: standard output)")
+@with_appcontext
+def export_data(kind, format, since, output):
+    """Stream the venues, artists or shows table as CSV, JSON Lines or Parquet."""
+    from fyyur.exporter import export, parse_since
+
+    try:
+        since = since and parse_since(since)
+    except ValueError:
+        raise click.BadParameter("not an ISO 8601 date and time", param_hint="--since")
+    try:
+        chunks = export(kind, format, since)
+    except ImportError:
+        raise click.ClickException("Parquet output needs the pyarrow package")
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        chunks.close()
+
+
+def init_app(app):
+    for command in (
+        explain_routes,
+        roll_show_counters,
+        rebuild_show_counters,
+        compile_templates,
+        build_assets,
+        import_data,
+        export_data,
+    ):
+        app.cli.add_command(command)
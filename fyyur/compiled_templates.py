@@ -0,0 +1,28 @@
+"""Precompiled Jinja templates.
+
+Jinja compiles every template to Python the first time it is rendered,
+which each new worker pays on its first requests. ``flask
+compile-templates`` compiles them all ahead of time into
+``COMPILED_TEMPLATES_DIR`` (run it during the build, after any template
+change); when that directory exists the app loads templates from it and
+falls back to the source files for anything missing. Compiled templates
+are never checked against their sources, so stale output keeps being
+served until it is compiled again.
+"""
+import os
+
+from jinja2 import ChoiceLoader, ModuleLoader
+
+
+def compile_all(app, target):
+    # always compile from the sources, even when compiled output is in use
+    env = app.jinja_env.overlay(loader=app.create_global_jinja_loader())
+    os.makedirs(target, exist_ok=True)
+    env.compile_templates(target, zip=None, ignore_errors=False)
+    return len(env.list_templates())
+
+
+def init_app(app):
+    target = app.config["COMPILED_TEMPLATES_DIR"]
+    if target and os.path.isdir(target):
+        app.jinja_env.loader = ChoiceLoader([ModuleLoader(target), app.jinja_env.loader])
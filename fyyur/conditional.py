@@ -0,0 +1,65 @@
+"""Conditional GET support.
+
+``@conditional(validator)`` calls ``validator(**view_args)`` before the
+view runs. The validator returns the values the page depends on (update
+timestamps, row counts, ...) or ``None`` to skip the check; they are
+hashed into a strong ETag, the newest datetime among them becomes
+``Last-Modified``, and a matching ``If-None-Match`` (or, without one,
+``If-Modified-Since``) is answered with 304 before any show is loaded or
+template rendered.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+
+def _last_modified(values):
+    moments = [value for value in values if isinstance(value, datetime)]
+    if not moments:
+        return None
+    return max(moments).replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(validator):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            run = current_app.ensure_sync(view)
+            if request.method not in ("GET", "HEAD") or "_flashes" in session:
+                return run(*args, **kwargs)
+            values = validator(**kwargs)
+            if values is None:
+                return run(*args, **kwargs)
+
+            # pages differ by locale and time zone too (see fyyur/datefmt.py)
+            etag = hashlib.sha1(
+                repr((g.get("render_variant"), tuple(values))).encode()
+            ).hexdigest()
+            last_modified = _last_modified(values)
+            # the response cache keys on it, so it never pairs this ETag
+            # with a page rendered from other data
+            g.etag = etag
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(run(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
@@ -1,109 +1,209 @@
+import hmac
 from datetime import datetime
-from flask import render_template, request, flash, redirect, url_for
-from sqlalchemy import func
-from fyyur import app, db
-from fyyur.forms import VenueForm, ArtistForm, ShowForm
+from itertools import groupby
+from operator import itemgetter
+from flask import abort, current_app, jsonify, render_template, request, flash, redirect, stream_with_context, url_for
+from sqlalchemy import func, select, tuple_
+from fyyur import aio, db, typeahead
+from fyyur.datefmt import format_all, to_stored
+from fyyur.cache import cache
+from fyyur.conditional import conditional
+from fyyur.instrumentation import query_budget
 from fyyur.model import Artist, Show, Venue
-import dateutil.parser
-import babel
+from fyyur.routing import replica_reads
+from fyyur.search import search
+from fyyur.streaming import stream_template
 
 
-def format_datetime(value, format="medium"):
-    if isinstance(value, str):
-        date = dateutil.parser.parse(value)
-    else:
-        date = value
+# Views are collected by @route and added in init_app(), under the same
+# endpoint names @app.route gave them.
+_rules = []
 
-    return babel.dates.format_datetime(date, format, locale="en")
 
+def route(rule, **options):
+  def decorator(view):
+    _rules.append((rule, view, options))
+    return view
 
-app.jinja_env.filters["datetime"] = format_datetime
+  return decorator
+
+
+# Validators for conditional GETs: everything a page renders changes one of
+# these values, including a show moving from upcoming to past.
+def venues_validators():
+  return db.session.query(func.count(Venue.id), func.max(Venue.updated_at)).one()
+
+
+def artists_validators():
+  return db.session.query(func.count(Artist.id), func.max(Artist.updated_at)).one()
+
+
+def shows_validators():
+  upcoming = Show.start_time > datetime.utcnow()
+  return db.session.query(
+      db.session.query(func.count(Show.id)).filter(upcoming).scalar_subquery(),
+      db.session.query(func.max(Show.updated_at)).filter(upcoming).scalar_subquery(),
+      db.session.query(func.max(Venue.updated_at)).scalar_subquery(),
+      db.session.query(func.max(Artist.updated_at)).scalar_subquery(),
+  ).one()
+
+
+def venue_validators(venue_id):
+  return (
+      db.session.query(
+          Venue.updated_at,
+          func.count(Show.id),
+          func.count(Show.id).filter(Show.start_time > datetime.utcnow()),
+          func.max(Show.updated_at),
+          func.max(Artist.updated_at),
+      )
+      .outerjoin(Show, Show.venue_id == Venue.id)
+      .outerjoin(Artist, Artist.id == Show.artist_id)
+      .filter(Venue.id == venue_id)
+      .group_by(Venue.id)
+      .first()
+  )
+
+
+def artist_validators(artist_id):
+  return (
+      db.session.query(
+          Artist.updated_at,
+          func.count(Show.id),
+          func.count(Show.id).filter(Show.start_time > datetime.utcnow()),
+          func.max(Show.updated_at),
+          func.max(Venue.updated_at),
+      )
+      .outerjoin(Show, Show.artist_id == Artist.id)
+      .outerjoin(Venue, Venue.id == Show.venue_id)
+      .filter(Artist.id == artist_id)
+      .group_by(Artist.id)
+      .first()
+  )
+
+
+def with_start_time_text(shows):
+  texts = format_all([show.start_time for show in shows], "full")
+  return [dict(show._mapping, start_time_text=text) for show, text in zip(shows, texts)]
+
+
+# Cached pages that show a venue or an artist: its own page, the lists, and
+# the pages of everyone it shares a show with.
+def venue_page_tags(venue_id):
+    artist_ids = db.session.query(Show.artist_id).filter_by(venue_id=venue_id).distinct()
+    return [
+        "venues",
+        "shows",
+        f"venue:{venue_id}",
+        *(f"artist:{artist_id}" for artist_id, in artist_ids),
+    ]
+
+
+def invalidate_venue_pages(venue_id):
+    cache.invalidate(*venue_page_tags(venue_id))
+
+
+def invalidate_artist_pages(artist_id):
+    venue_ids = db.session.query(Show.venue_id).filter_by(artist_id=artist_id).distinct()
+    cache.invalidate(
+        "artists",
+        "shows",
+        f"artist:{artist_id}",
+        *(f"venue:{venue_id}" for venue_id, in venue_ids),
+    )
 
 
 # Controllers.
-@app.route("/")
+@route("/")
 def index():
     return render_template("pages/home.html")
 
 
-@app.route("/venues")
+@route("/venues")
+@conditional(venues_validators)
+@cache.cached("venues")
+@query_budget(1)
 def venues():
-  areas = Venue.query.distinct(Venue.city, Venue.state).all()
+  # Upcoming show counts are read from the denormalized counters, so the
+  # listing never touches the Show table.
+  rows = (
+      db.session.query(
+          Venue.city,
+          Venue.state,
+          Venue.id,
+          Venue.name,
+          Venue.upcoming_shows_count,
+      )
+      .order_by(Venue.state, Venue.city, Venue.name)
+      .all()
+  )
   data = []
 
-  for area in areas:
-    area_venues = (
-        Venue.query.filter_by(state=area.state).filter_by(city=area.city).all()
-    )
-    venue_data = []
-    for venue in area_venues:
-        venue_data.append(
-          {
-              "id": venue.id,
-              "name": venue.name,
-              "num_upcoming_shows": len(
-                  Show.query.filter(Show.venue_id == venue.id)
-                  .filter(Show.start_time > datetime.now())
-                  .all()
-              ),
-          }
-        )
-    data.append({"city": area.city, "state": area.state, "venues": venue_data})
+  for (city, state), area_venues in groupby(rows, key=itemgetter(0, 1)):
+    venue_data = [
+        {"id": venue_id, "name": name, "num_upcoming_shows": num_upcoming_shows}
+        for _, _, venue_id, name, num_upcoming_shows in area_venues
+    ]
+    data.append({"city": city, "state": state, "venues": venue_data})
   return render_template("pages/venues.html", areas=data)
 
 
-@app.route("/venues/search", methods=["POST"])
-def search_venues():
+@route("/venues/search", methods=["POST"])
+@replica_reads
+@query_budget(2)
+async def search_venues():
   search_term = request.form.get("search_term", "")
+  results = await search(Venue, search_term)
 
-
-  query = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-  results = {
-    "count": len(query),
-    "data": query
-  }
-    
   return render_template(
         "pages/search_venues.html", results=results, search_term=search_term
     )
 
 
-@app.route("/venues/<int:venue_id>")
-def show_venue(venue_id):
-  data = Venue.query.filter_by(id=venue_id).first()
-
-  upcoming_shows = []
-  past_shows = []
-  
-  for show in data.show:
-    show_detail = {
-        "artist_id": show.artist_id, 
-        "artist_name": show.artist.name, 
-        "artist_image_link": show.artist.image_link, 
-        "start_time": show.start_time
-      }
-    if show.start_time > datetime.now():
-        upcoming_shows.append(show_detail)
-    else:
-        past_shows.append(show_detail)
-  data.upcoming_shows = upcoming_shows
-  data.past_shows = past_shows
-  data.upcoming_shows_count = len(upcoming_shows)
-  data.past_shows_count = len(past_shows)
+@route("/venues/<int:venue_id>")
+@conditional(venue_validators)
+@cache.cached("venue:{venue_id}")
+@query_budget(3)
+async def show_venue(venue_id):
+  now = datetime.utcnow()
+  shows = (
+      select(
+          Show.artist_id,
+          Artist.name.label("artist_name"),
+          Artist.image_link.label("artist_image_link"),
+          Show.start_time,
+      )
+      .join(Artist, Artist.id == Show.artist_id)
+      .filter(Show.venue_id == venue_id)
+  )
+  venue, upcoming_shows, past_shows = await aio.gather(
+      select(Venue).filter(Venue.id == venue_id),
+      shows.filter(Show.start_time > now).order_by(Show.start_time),
+      shows.filter(Show.start_time <= now).order_by(Show.start_time.desc()),
+  )
+  if not venue:
+    abort(404)
+
+  data = dict(venue[0]._mapping)
+  data["upcoming_shows"] = with_start_time_text(upcoming_shows)
+  data["past_shows"] = with_start_time_text(past_shows)
+  data["upcoming_shows_count"] = len(upcoming_shows)
+  data["past_shows_count"] = len(past_shows)
   return render_template("pages/show_venue.html", venue=data)
 
-  # except:
-  #   flash("Venue with this id doesn't exist")
-  
 
-@app.route("/venues/create", methods=["GET"])
+@route("/venues/create", methods=["GET"])
 def create_venue_form():
+    from fyyur.forms import VenueForm
+
     form = VenueForm()
     return render_template("forms/new_venue.html", form=form)
 
 
-@app.route("/venues/create", methods=["POST"])
+@route("/venues/create", methods=["POST"])
 def create_venue_submission():
+  from fyyur.forms import VenueForm
+
   form = VenueForm(request.form)
   if request.method == "POST":
     try:
@@ -122,6 +222,8 @@ def create_venue_submission():
       )
       db.session.add(venue)
       db.session.commit()
+      typeahead.add(typeahead.VENUE, venue.id, form.name.data)
+      cache.invalidate("venues")
       flash("Venue " + form.name.data + " was successfully listed!")
     except Exception as e:
       print(e)
@@ -135,12 +237,16 @@ def create_venue_submission():
   return render_template("pages/home.html")
 
 
-@app.route("/venues/<venue_id>", methods=["DELETE"])
+@route("/venues/<venue_id>", methods=["DELETE"])
 def delete_venue(venue_id):
   try:
       venue = Venue.query.get(venue_id)
+      # tagged from its shows while they are still there
+      tags = venue_page_tags(int(venue_id))
       db.session.delete(venue)
       db.session.commit()
+      typeahead.remove(typeahead.VENUE, int(venue_id))
+      cache.invalidate(*tags)
   except:
       db.session.rollback()
   finally:
@@ -148,55 +254,111 @@ def delete_venue(venue_id):
   return render_template("pages/home.html")
 
 
-@app.route("/artists")
+@route("/search/suggest")
+def search_suggest():
+  query = request.args.get("q", "")
+  limit = min(request.args.get("limit", 10, type=int), 50)
+  return jsonify(
+      data=[
+          {"type": kind, "id": id, "name": name}
+          for kind, id, name in typeahead.suggest(query, limit)
+      ]
+  )
+
+
+@route("/export/<kind>.<format>")
+def export_data(kind, format):
+  from fyyur.exporter import FORMATS, export, parse_since
+
+  token = current_app.config["EXPORT_TOKEN"]
+  if not token:
+    abort(404)
+  # compared as bytes: compare_digest refuses str with non-ASCII characters
+  given = request.headers.get("Authorization", "").encode("utf-8", "surrogateescape")
+  if not hmac.compare_digest(given, ("Bearer " + token).encode("utf-8")):
+    abort(401)
+  if kind not in ("artists", "shows", "venues") or format not in FORMATS:
+    abort(404)
+  try:
+    since = request.args.get("since")
+    since = since and parse_since(since)
+    chunks = export(kind, format, since)
+  except ValueError:
+    abort(400)
+  except ImportError:
+    abort(501)
+
+  response = current_app.response_class(
+      stream_with_context(chunks), mimetype=FORMATS[format]
+  )
+  response.headers["Content-Disposition"] = "attachment; filename=%s.%s" % (kind, format)
+  return response
+
+
+@route("/artists")
+@conditional(artists_validators)
+@cache.cached("artists")
+@query_budget(1)
 def artists():
-  data = Artist.query.all()
-  return render_template("pages/artists.html", artists=data)
-
-
-@app.route("/artists/search", methods=["POST"])
-def search_artists():
+  # The query runs here; its rows are fetched in batches while the page
+  # is streamed out.
+  rows = (
+      db.session.query(Artist.id, Artist.name)
+      .order_by(Artist.id)
+      .yield_per(current_app.config["STREAM_BATCH_ROWS"])
+  )
+  return stream_template("pages/artists.html", artists=iter(rows))
+
+
+@route("/artists/search", methods=["POST"])
+@replica_reads
+@query_budget(2)
+async def search_artists():
   search_term = request.form.get("search_term", "")
-
-
-  query = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-  results = {
-    "count": len(query),
-    "data": query
-  }
+  results = await search(Artist, search_term)
 
   return render_template(
         "pages/search_artists.html", results=results, search_term=search_term
     )
 
 
-@app.route("/artists/<int:artist_id>")
-def show_artist(artist_id):
-  data = Artist.query.filter_by(id=artist_id).first()
-
-  upcoming_shows = []
-  past_shows = []
-  
-  for show in data.show:
-    show_detail = {
-        "venue_id": show.venue_id, 
-        "venue_name": show.venue.name, 
-        "venue_image_link": show.venue.image_link, 
-        "start_time": show.start_time
-      }
-    if show.start_time > datetime.now():
-        upcoming_shows.append(show_detail)
-    else:
-        past_shows.append(show_detail)
-  data.upcoming_shows = upcoming_shows
-  data.past_shows = past_shows
-  data.upcoming_shows_count = len(upcoming_shows)
-  data.past_shows_count = len(past_shows)
+@route("/artists/<int:artist_id>")
+@conditional(artist_validators)
+@cache.cached("artist:{artist_id}")
+@query_budget(3)
+async def show_artist(artist_id):
+  now = datetime.utcnow()
+  shows = (
+      select(
+          Show.venue_id,
+          Venue.name.label("venue_name"),
+          Venue.image_link.label("venue_image_link"),
+          Show.start_time,
+      )
+      .join(Venue, Venue.id == Show.venue_id)
+      .filter(Show.artist_id == artist_id)
+  )
+  artist, upcoming_shows, past_shows = await aio.gather(
+      select(Artist).filter(Artist.id == artist_id),
+      shows.filter(Show.start_time > now).order_by(Show.start_time),
+      shows.filter(Show.start_time <= now).order_by(Show.start_time.desc()),
+  )
+  if not artist:
+    abort(404)
+
+  data = dict(artist[0]._mapping)
+  data["upcoming_shows"] = with_start_time_text(upcoming_shows)
+  data["past_shows"] = with_start_time_text(past_shows)
+  data["upcoming_shows_count"] = len(upcoming_shows)
+  data["past_shows_count"] = len(past_shows)
   return render_template("pages/show_artist.html", artist=data)
 
 
-@app.route("/artists/<int:artist_id>/edit", methods=["GET"])
+@route("/artists/<int:artist_id>/edit", methods=["GET"])
+@query_budget(1)
 def edit_artist(artist_id):
+  from fyyur.forms import ArtistForm
+
   artist = Artist.query.get(artist_id)
  
   if artist:
@@ -207,26 +369,30 @@ def edit_artist(artist_id):
   return render_template("forms/edit_artist.html", form=form, artist=artist)
 
 
-@app.route("/artists/<int:artist_id>/edit", methods=["POST"])
+@route("/artists/<int:artist_id>/edit", methods=["POST"])
 def edit_artist_submission(artist_id):
+  from fyyur.forms import ArtistForm
+
   form = ArtistForm(request.form)
   artist = Artist.query.get(artist_id)
   if request.method == "POST":
     try:
 
-      artist.name=form.name.data,
-      artist.city=form.city.data,
-      artist.state=form.state.data,
-      artist.phone=form.phone.data,
-      artist.image_link=form.image_link.data,
-      artist.genres=form.genres.data,
-      artist.facebook_link=form.facebook_link.data,
-      artist.website_link=form.website_link.data,
-      artist.seeking_venue=form.seeking_venue.data,
-      artist.seeking_description=form.seeking_description.data,
+      artist.name=form.name.data
+      artist.city=form.city.data
+      artist.state=form.state.data
+      artist.phone=form.phone.data
+      artist.image_link=form.image_link.data
+      artist.genres=form.genres.data
+      artist.facebook_link=form.facebook_link.data
+      artist.website_link=form.website_link.data
+      artist.seeking_venue=form.seeking_venue.data
+      artist.seeking_description=form.seeking_description.data
   
       db.session.add(artist)
       db.session.commit()
+      typeahead.add(typeahead.ARTIST, artist_id, form.name.data)
+      invalidate_artist_pages(artist_id)
       flash("Artist " + form.name.data + " was successfully edited!")
     except Exception as e:
       print(e)
@@ -240,8 +406,11 @@ def edit_artist_submission(artist_id):
   return redirect(url_for("show_artist", artist_id=artist_id))
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["GET"])
+@route("/venues/<int:venue_id>/edit", methods=["GET"])
+@query_budget(1)
 def edit_venue(venue_id):
+  from fyyur.forms import VenueForm
+
   form = VenueForm()
   try:
       venue = Venue.query.get(venue_id)
@@ -250,7 +419,7 @@ def edit_venue(venue_id):
       flash("Venue with this ID doesn't exist")
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["POST"])
+@route("/venues/<int:venue_id>/edit", methods=["POST"])
 def edit_venue_submission(venue_id):
   try:
       venue = Venue.query.get(venue_id)
@@ -268,6 +437,8 @@ def edit_venue_submission(venue_id):
 
       db.session.add(venue)
       db.session.commit()
+      typeahead.add(typeahead.VENUE, venue_id, request.form.get("name"))
+      invalidate_venue_pages(venue_id)
 
   except:
       db.session.rollback()
@@ -276,14 +447,18 @@ def edit_venue_submission(venue_id):
   return redirect(url_for("show_venue", venue_id=venue_id))
 
 
-@app.route("/artists/create", methods=["GET"])
+@route("/artists/create", methods=["GET"])
 def create_artist_form():
+  from fyyur.forms import ArtistForm
+
   form = ArtistForm()
   return render_template("forms/new_artist.html", form=form)
 
 
-@app.route("/artists/create", methods=["POST"])
+@route("/artists/create", methods=["POST"])
 def create_artist_submission():
+  from fyyur.forms import ArtistForm
+
   form = ArtistForm(request.form)
   if request.method == "POST":
     try:
@@ -301,6 +476,8 @@ def create_artist_submission():
       )
       db.session.add(artist)
       db.session.commit()
+      typeahead.add(typeahead.ARTIST, artist.id, form.name.data)
+      cache.invalidate("artists")
       flash("Artist " + form.name.data + " was successfully listed!")
     except Exception as e:
       print(e)
@@ -314,50 +491,106 @@ def create_artist_submission():
   return render_template("pages/home.html")
 
 
-@app.route("/shows")
-def shows():
-  current_time = datetime.now()
+def encode_show_cursor(start_time, show_id):
+    return f"{start_time.isoformat()},{show_id}"
 
-  data = []
-  allshows = Show.query.all()
-
-  for show in allshows:
-    artist = Artist.query.get(show.artist_id)
-    venue = Venue.query.get(show.venue_id)
-
-    if show.start_time > current_time:
-      data.append(
-        {
-          "venue_id": show.venue_id,
-          "venue_name": venue.name,
-          "artist_id": show.artist_id,
-          "artist_name": artist.name,
-          "artist_image_link": artist.image_link,
-          "start_time": show.start_time,
-        }
+
+def decode_show_cursor(cursor):
+    try:
+        start_time, show_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(start_time), int(show_id)
+    except ValueError:
+        abort(400)
+
+
+@route("/shows")
+@conditional(shows_validators)
+@cache.cached("shows")
+@query_budget(1)
+def shows():
+  current_time = datetime.utcnow()
+  per_page = current_app.config["SHOWS_PER_PAGE"]
+
+  # Upcoming shows are filtered, ordered and paged in SQL; the keyset on
+  # (start_time, id) keeps deep pages as cheap as the first one.
+  query = (
+      db.session.query(
+          Show.id,
+          Show.start_time,
+          Show.venue_id,
+          Venue.name,
+          Show.artist_id,
+          Artist.name,
+          Artist.image_link,
       )
+      .join(Venue, Show.venue_id == Venue.id)
+      .join(Artist, Show.artist_id == Artist.id)
+      .filter(Show.start_time > current_time)
+  )
+  cursor = request.args.get("after")
+  if cursor:
+    query = query.filter(
+        tuple_(Show.start_time, Show.id) > tuple_(*decode_show_cursor(cursor))
+    )
+  rows = query.order_by(Show.start_time, Show.id).limit(per_page + 1).all()
+
+  next_cursor = None
+  if len(rows) > per_page:
+    rows = rows[:per_page]
+    next_cursor = encode_show_cursor(rows[-1][1], rows[-1][0])
+
+  data = [
+      {
+          "venue_id": venue_id,
+          "venue_name": venue_name,
+          "artist_id": artist_id,
+          "artist_name": artist_name,
+          "artist_image_link": artist_image_link,
+          "start_time": start_time,
+          "start_time_text": start_time_text,
+      }
+      for (
+          _,
+          start_time,
+          venue_id,
+          venue_name,
+          artist_id,
+          artist_name,
+          artist_image_link,
+      ), start_time_text in zip(rows, format_all([row[1] for row in rows], "full"))
+  ]
 
-  return render_template("pages/shows.html", shows=data)
+  return stream_template("pages/shows.html", shows=data, next_cursor=next_cursor)
 
 
-@app.route("/shows/create")
+@route("/shows/create")
 def create_shows():
+    from fyyur.forms import ShowForm
+
     form = ShowForm()
     return render_template("forms/new_show.html", form=form)
 
 
-@app.route("/shows/create", methods=["POST"])
+@route("/shows/create", methods=["POST"])
 def create_show_submission():
+  from fyyur.forms import ShowForm
+
   form = ShowForm(request.form)
   if request.method == "POST":
     try:
       show = Show(
           artist_id=form.artist_id.data,
           venue_id=form.venue_id.data,
-          start_time=form.start_time.data,
+          start_time=to_stored(form.start_time.data),
       )
       db.session.add(show)
       db.session.commit()
+      cache.invalidate(
+          "shows",
+          "venues",
+          f"venue:{int(form.venue_id.data)}",
+          f"artist:{int(form.artist_id.data)}",
+      )
       flash("Show was successfully listed!")
           
     except:
@@ -368,10 +601,15 @@ def create_show_submission():
   return render_template("pages/home.html")
 
 
-@app.errorhandler(404)
 def not_found_error(error):
   return render_template("errors/404.html"), 404
 
-@app.errorhandler(500)
 def server_error(error):
   return render_template("errors/500.html"), 500
+
+
+def init_app(app):
+  for rule, view, options in _rules:
+    app.add_url_rule(rule, view_func=view, **options)
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)
@@ -0,0 +1,112 @@
+"""Denormalized upcoming/past show counts on Venue and Artist.
+
+The counts are exact as of ``ShowCounterClock.rolled_at``: a show counts
+as upcoming while its ``start_time`` is after that instant. Inserting or
+deleting a Show adjusts both counters inside the same flush, and
+:func:`roll_forward` (``flask roll-show-counters``, run from a scheduler)
+moves the shows that started since the last roll from upcoming to past.
+:func:`rebuild` recounts everything from the Show table.
+
+Writers take a shared lock on the clock row and the roll takes an
+exclusive one, so a show created during a roll is classified against
+the clock the roll leaves behind and never counted twice.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, func, select, update
+
+from fyyur import db
+from fyyur.model import Artist, Show, ShowCounterClock, Venue
+
+clock = ShowCounterClock.__table__
+shows = Show.__table__
+COUNTED = ((Venue.__table__, shows.c.venue_id), (Artist.__table__, shows.c.artist_id))
+
+
+def _rolled_at(connection, exclusive=False):
+    rolled_at = connection.execute(
+        select(clock.c.rolled_at).with_for_update(read=not exclusive)
+    ).scalar()
+    if rolled_at is None:
+        rolled_at = datetime.utcnow()
+        connection.execute(clock.insert().values(id=1, rolled_at=rolled_at))
+    return rolled_at
+
+
+def _adjust(connection, show, delta):
+    if show.start_time is None:
+        return
+    if show.start_time > _rolled_at(connection):
+        column = "upcoming_shows_count"
+    else:
+        column = "past_shows_count"
+    for table, foreign_key in COUNTED:
+        connection.execute(
+            update(table)
+            .where(table.c.id == getattr(show, foreign_key.key))
+            .values({column: table.c[column] + delta})
+        )
+
+
+@event.listens_for(Show, "after_insert")
+def _show_inserted(mapper, connection, show):
+    _adjust(connection, show, 1)
+
+
+@event.listens_for(Show, "after_delete")
+def _show_deleted(mapper, connection, show):
+    _adjust(connection, show, -1)
+
+
+def _count_shows(table, foreign_key, *conditions):
+    return (
+        select(func.count())
+        .select_from(shows)
+        .where(foreign_key == table.c.id, *conditions)
+        .scalar_subquery()
+    )
+
+
+def roll_forward(now=None):
+    """Move shows that started since the last roll from upcoming to past."""
+    now = now or datetime.utcnow()
+    with db.engine.begin() as connection:
+        rolled_at = _rolled_at(connection, exclusive=True)
+        if now <= rolled_at:
+            return 0
+        started = (shows.c.start_time > rolled_at, shows.c.start_time <= now)
+        moved = connection.execute(
+            select(func.count()).select_from(shows).where(*started)
+        ).scalar()
+        if moved:
+            for table, foreign_key in COUNTED:
+                crossed = _count_shows(table, foreign_key, *started)
+                connection.execute(
+                    update(table)
+                    .where(table.c.id.in_(select(foreign_key).where(*started)))
+                    .values(
+                        upcoming_shows_count=table.c.upcoming_shows_count - crossed,
+                        past_shows_count=table.c.past_shows_count + crossed,
+                    )
+                )
+        connection.execute(clock.update().values(rolled_at=now))
+    return moved
+
+
+def rebuild(now=None):
+    """Recount every Venue and Artist from the Show table."""
+    now = now or datetime.utcnow()
+    with db.engine.begin() as connection:
+        _rolled_at(connection, exclusive=True)
+        for table, foreign_key in COUNTED:
+            connection.execute(
+                update(table).values(
+                    upcoming_shows_count=_count_shows(
+                        table, foreign_key, shows.c.start_time > now
+                    ),
+                    past_shows_count=_count_shows(
+                        table, foreign_key, shows.c.start_time <= now
+                    ),
+                )
+            )
+        connection.execute(clock.update().values(rolled_at=now))
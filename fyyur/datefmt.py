@@ -0,0 +1,132 @@
+"""Datetime formatting for the pages.
+
+``babel.dates.format_datetime`` resolves the locale, the datetime layout
+and the date and time patterns on every call. Here they are resolved once
+per (format, locale, time zone) and kept, and formatted values are
+memoized, so the show tiles of a page - and of every later page showing
+the same shows - cost a dictionary lookup each. :func:`format_all`
+formats a whole list at once; the ``datetime`` template filter formats a
+single value the same way.
+
+Each request is rendered in the best match for its ``Accept-Language``
+among ``LANGUAGES`` and in the time zone named by its ``tz`` cookie
+(``DISPLAY_TIMEZONE`` otherwise). Stored times are naive UTC, as babel
+assumes: the views compare them with ``datetime.utcnow()``, and a time
+typed into a form is read in the visitor's time zone and converted with
+:func:`to_stored`. The pair is published as ``g.render_variant`` so the
+response cache and the ETags keep the variants of a page apart.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app, g, has_request_context, request
+
+NAMED_FORMATS = ("full", "long", "medium", "short")
+
+
+@lru_cache(maxsize=64)
+def _formatter(format, locale_name, timezone_name):
+    from babel import Locale
+    from babel.dates import (
+        UTC,
+        get_date_format,
+        get_datetime_format,
+        get_time_format,
+        get_timezone,
+        parse_pattern,
+    )
+
+    locale = Locale.parse(locale_name)
+    timezone = get_timezone(timezone_name)
+
+    def localize(value):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=UTC)
+        return timezone.normalize(value.astimezone(timezone))
+
+    if format not in NAMED_FORMATS:
+        pattern = parse_pattern(format)
+        return lambda value: pattern.apply(localize(value), locale)
+
+    layout = get_datetime_format(format, locale).replace("'", "")
+    date_pattern = get_date_format(format, locale)
+    time_pattern = get_time_format(format, locale)
+
+    def apply(value):
+        value = localize(value)
+        return layout.replace("{0}", time_pattern.apply(value, locale)).replace(
+            "{1}", date_pattern.apply(value.date(), locale)
+        )
+
+    return apply
+
+
+@lru_cache(maxsize=8192)
+def _format(value, format, locale_name, timezone_name):
+    if isinstance(value, str):
+        import dateutil.parser
+
+        value = dateutil.parser.parse(value)
+    return _formatter(format, locale_name, timezone_name)(value)
+
+
+def _variant():
+    if has_request_context() and "locale" in g:
+        return g.locale, g.timezone
+    return current_app.config["LANGUAGES"][0], current_app.config["DISPLAY_TIMEZONE"]
+
+
+def format_datetime(value, format="medium"):
+    return _format(value, format, *_variant())
+
+
+def format_all(values, format="medium"):
+    locale_name, timezone_name = _variant()
+    return [_format(value, format, locale_name, timezone_name) for value in values]
+
+
+def _zone():
+    from babel.dates import get_timezone
+
+    return get_timezone(_variant()[1])
+
+
+def to_stored(value):
+    """Convert a naive time in the visitor's time zone to stored naive UTC."""
+    from babel.dates import UTC
+
+    zone = _zone()
+    return zone.localize(value).astimezone(UTC).replace(tzinfo=None)
+
+
+def local_now():
+    """Return the current time in the visitor's time zone, naive, as forms show it."""
+    return datetime.now(_zone()).replace(tzinfo=None, microsecond=0)
+
+
+def _valid_timezone(name):
+    import pytz
+
+    return name in pytz.all_timezones_set
+
+
+def _select_variant():
+    languages = current_app.config["LANGUAGES"]
+    g.locale = request.accept_languages.best_match(languages, default=languages[0])
+    g.timezone = current_app.config["DISPLAY_TIMEZONE"]
+    requested = request.cookies.get("tz")
+    if requested and requested != g.timezone and _valid_timezone(requested):
+        g.timezone = requested
+    g.render_variant = "%s|%s" % (g.locale, g.timezone)
+
+
+def _vary(response):
+    if len(current_app.config["LANGUAGES"]) > 1:
+        response.vary.add("Accept-Language")
+    return response
+
+
+def init_app(app):
+    app.jinja_env.filters["datetime"] = format_datetime
+    app.before_request(_select_variant)
+    app.after_request(_vary)
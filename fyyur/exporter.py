@@ -0,0 +1,163 @@
+"""Streaming export of the Venue, Artist and Show tables.
+
+:func:`export` streams a table as CSV, JSON Lines or Parquet in chunks
+of ``STREAM_BATCH_ROWS`` rows, read with ``stream_results`` (a server-side
+cursor on PostgreSQL), so memory stays flat whatever the table size. It
+backs both ``GET /export/<kind>.<format>`` and ``flask export-data``.
+
+``since`` limits the export to rows whose ``updated_at`` is at or after
+it; a partner keeps the largest ``updated_at`` of one export as the
+``since`` of the next. Deletions do not show up in incremental exports.
+
+CSV writes ``genres`` comma separated, as ``flask import-data`` reads
+it. Parquet needs the ``pyarrow`` package and is written one row group
+per chunk.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import select
+
+from fyyur import db
+from fyyur.importer import TABLES
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parse_since(value):
+    """Parse an ISO 8601 ``since`` into the naive UTC the tables store."""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ", ".join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv(names, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _jsonl(names, batches):
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(names, row)), default=_default) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+class _Sink:
+    """Write-only file that hands what was written back in chunks."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(column):
+    import pyarrow
+
+    kind = getattr(column.type, "impl", column.type).python_type
+    if kind is list:
+        return pyarrow.list_(pyarrow.string())
+    if kind is datetime:
+        return pyarrow.timestamp("us")
+    if kind is int:
+        return pyarrow.int64()
+    return pyarrow.string()
+
+
+def _parquet(table, batches):
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema([(column.name, _arrow_type(column)) for column in table.columns])
+    sink = _Sink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for rows in batches:
+        columns = list(zip(*rows))
+        writer.write_table(pyarrow.table(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _closing(result, chunks):
+    try:
+        yield from chunks
+    finally:
+        result.close()
+
+
+def export(kind, format, since=None):
+    """Return an iterator over the ``kind`` table in ``format``, as bytes."""
+    if format == "parquet":
+        # fail before the response starts rather than halfway through it
+        import pyarrow.parquet  # noqa: F401
+
+    table = TABLES[kind]
+    statement = select(table).order_by(table.c.id)
+    if since is not None:
+        statement = statement.where(table.c.updated_at >= since)
+    names = [column.name for column in table.columns]
+    size = current_app.config["STREAM_BATCH_ROWS"]
+
+    result = db.session.execute(
+        statement, execution_options={"stream_results": True, "max_row_buffer": size}
+    )
+    batches = (list(map(tuple, rows)) for rows in result.partitions(size))
+    if format == "csv":
+        chunks = _csv(names, batches)
+    elif format == "jsonl":
+        chunks = _jsonl(names, batches)
+    else:
+        chunks = _parquet(table, batches)
+    return _closing(result, chunks)
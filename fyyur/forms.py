@@ -1,7 +1,7 @@
-from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
 from wtforms.validators import DataRequired, AnyOf, URL
+from fyyur.datefmt import local_now
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -13,7 +13,7 @@ class ShowForm(Form):
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default= datetime.today()
+        default=local_now
     )
 
 class VenueForm(Form):
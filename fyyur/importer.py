@@ -0,0 +1,284 @@
+"""Bulk import of venues, artists and shows from CSV or JSON Lines.
+
+``flask import-data venues venues.csv`` reads the file as a stream and
+inserts its rows in batches, each batch in its own transaction: through
+``COPY`` on PostgreSQL with psycopg2 and a Core ``executemany``
+elsewhere, so no ORM objects are built. Fields are the table's columns;
+``genres`` is a list or a comma separated string, ``start_time`` is ISO
+8601 and taken as UTC unless it carries an offset, and a show names its
+artist and venue by ``artist_id`` / ``venue_id`` or by their unique
+``artist`` / ``venue`` name.
+
+A row that fails validation is rejected with its line number and the
+reason, and the rest of its batch goes in. When the database refuses a
+batch, the batch is retried row by row to single out the rows at fault.
+
+``COPY`` and Core inserts bypass the Show mapper events, so the show
+counters are rebuilt after shows are imported, and the cache tags of the
+imported pages are invalidated (which reaches other workers only with
+the shared cache backend). Workers load the typeahead index once, so
+imported names are suggested there after a restart.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import exc, select
+
+from fyyur import db
+from fyyur.model import Artist, Show, Venue
+
+TABLES = {"venues": Venue.__table__, "artists": Artist.__table__, "shows": Show.__table__}
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+BATCH_SIZE = 5000
+
+# filled in by the database or maintained by fyyur/counters.py
+GENERATED = {"id", "upcoming_shows_count", "past_shows_count", "updated_at"}
+# nullable in the schema, but required by the forms as well
+REQUIRED = {"name", "start_time"}
+REFERENCES = {"artist": Artist, "venue": Venue}
+
+
+class Rejected(ValueError):
+    pass
+
+
+def guess_format(path):
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def read_records(file, format):
+    """Yield ``(line, record)``; a line that is not a JSON object yields a ``Rejected``."""
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line, text in enumerate(file, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as error:
+            record = Rejected("invalid JSON: %s" % error)
+        if not isinstance(record, (dict, Rejected)):
+            record = Rejected("not a JSON object")
+        yield line, record
+
+
+def _converter(column):
+    """Return the function that validates and converts one field of ``column``."""
+    name = column.name
+    type_ = getattr(column.type, "impl", column.type)
+    required = not column.nullable or name in REQUIRED
+    kind = type_.python_type
+    length = getattr(type_, "length", None)
+
+    def convert(value):
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "" or value == []:
+            if required:
+                raise Rejected("%s is required" % name)
+            return None
+        if kind is str:
+            value = str(value)
+            if length and len(value) > length:
+                raise Rejected("%s is longer than %d characters" % (name, length))
+            return value
+        if kind is list:
+            if isinstance(value, str):
+                value = [part.strip() for part in value.split(",") if part.strip()]
+            if not isinstance(value, list):
+                raise Rejected("%s must be a list" % name)
+            return [str(item) for item in value]
+        if kind is datetime:
+            try:
+                moment = datetime.fromisoformat(str(value))
+            except ValueError:
+                raise Rejected("%s is not an ISO 8601 date and time" % name)
+            # stored times are naive UTC
+            if moment.tzinfo is not None:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+            return moment
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise Rejected("%s is not an integer" % name)
+
+    return convert
+
+
+class _Lookup:
+    """Ids and unique names of the existing artists or venues."""
+
+    def __init__(self, connection, model):
+        self.ids = set()
+        self.names = {}
+        for id, name in connection.execute(select(model.id, model.name)):
+            self.ids.add(id)
+            # None marks a name shared by several rows
+            self.names[name] = None if name in self.names else id
+
+    def resolve(self, prefix, record):
+        value = record.get(prefix + "_id")
+        if value not in (None, ""):
+            try:
+                id = int(value)
+            except (TypeError, ValueError):
+                raise Rejected("%s_id is not an integer" % prefix)
+            if id not in self.ids:
+                raise Rejected("no %s with id %d" % (prefix, id))
+            return id
+        name = record.get(prefix)
+        if not name:
+            raise Rejected("%s_id or %s is required" % (prefix, prefix))
+        if name not in self.names:
+            raise Rejected("no %s named %r" % (prefix, name))
+        if self.names[name] is None:
+            raise Rejected("several %ss are named %r, use %s_id" % (prefix, name, prefix))
+        return self.names[name]
+
+
+class Importer:
+    def __init__(self, kind, batch_size=BATCH_SIZE, reject=None):
+        self.kind = kind
+        self.table = TABLES[kind]
+        self.converters = [
+            (column.name, _converter(column))
+            for column in self.table.columns
+            if column.name not in GENERATED
+        ]
+        self.batch_size = batch_size
+        self.reject = reject or (lambda line, reason, record: None)
+        self.imported = 0
+        self.rejected = 0
+        # artists and venues whose show lists changed
+        self.touched = {prefix: set() for prefix in REFERENCES}
+        # COPY goes through the driver's cursor, whose errors are not wrapped
+        self.errors = (exc.DBAPIError, db.engine.dialect.dbapi.Error)
+        self.lookups = {}
+        if kind == "shows":
+            with db.engine.connect() as connection:
+                self.lookups = {
+                    prefix: _Lookup(connection, model)
+                    for prefix, model in REFERENCES.items()
+                }
+
+    def row(self, record):
+        if isinstance(record, Rejected):
+            raise record
+        row = {}
+        for prefix, lookup in self.lookups.items():
+            row[prefix + "_id"] = lookup.resolve(prefix, record)
+        for name, convert in self.converters:
+            if name not in row:
+                row[name] = convert(record.get(name))
+        return row
+
+    def run(self, records):
+        batch = []
+        for line, record in records:
+            try:
+                batch.append((line, self.row(record), record))
+            except Rejected as error:
+                self._reject(line, str(error), record)
+                continue
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        return self.imported, self.rejected
+
+    def _reject(self, line, reason, record):
+        self.rejected += 1
+        self.reject(line, reason, None if isinstance(record, Rejected) else record)
+
+    def _flush(self, batch):
+        now = datetime.utcnow()
+        for _, row, _ in batch:
+            row["updated_at"] = now
+        try:
+            with db.engine.begin() as connection:
+                self._write(connection, [row for _, row, _ in batch])
+            inserted = batch
+        except self.errors:
+            inserted = self._write_one_by_one(batch)
+        self.imported += len(inserted)
+        for prefix, ids in self.touched.items():
+            if prefix in self.lookups:
+                ids.update(row[prefix + "_id"] for _, row, _ in inserted)
+
+    def _write(self, connection, rows):
+        if connection.dialect.driver == "psycopg2":
+            _copy(connection, self.table, rows)
+        else:
+            connection.execute(self.table.insert(), rows)
+
+    def _write_one_by_one(self, batch):
+        inserted = []
+        with db.engine.begin() as connection:
+            for line, row, record in batch:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(self.table.insert(), row)
+                except exc.DBAPIError as error:
+                    self._reject(line, str(error.orig).strip().splitlines()[0], record)
+                else:
+                    inserted.append((line, row, record))
+        return inserted
+
+    def finish(self):
+        """Bring the counters and cached pages up to date with the import."""
+        from fyyur import counters
+        from fyyur.cache import cache
+
+        if not self.imported:
+            return
+        if self.kind == "shows":
+            counters.rebuild()
+            cache.invalidate(
+                "shows",
+                "venues",
+                *("venue:%d" % id for id in self.touched["venue"]),
+                *("artist:%d" % id for id in self.touched["artist"]),
+            )
+        else:
+            cache.invalidate(self.kind)
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, list):
+        value = "{%s}" % ",".join(
+            '"%s"' % item.replace("\\", "\\\\").replace('"', '\\"') for item in value
+        )
+    elif isinstance(value, datetime):
+        value = value.isoformat(" ")
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy(connection, table, rows):
+    names = list(rows[0])
+    preparer = connection.dialect.identifier_preparer
+    statement = "COPY %s (%s) FROM STDIN" % (
+        preparer.format_table(table),
+        ", ".join(preparer.quote(name) for name in names),
+    )
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(row[name]) for name in names))
+        buffer.write("\n")
+    buffer.seek(0)
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(statement, buffer)
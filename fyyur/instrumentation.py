@@ -0,0 +1,122 @@
+"""Per-request SQL and template instrumentation.
+
+While a request is handled, every statement executed through an
+SQLAlchemy engine is counted and timed on ``flask.g``, and so is template
+rendering. The totals are sent back in a ``Server-Timing`` header::
+
+    Server-Timing: db;dur=4.2;desc="3 queries", tpl;dur=1.9, total;dur=7.5
+
+Statements slower than ``SLOW_QUERY_MS`` and requests slower than
+``SLOW_REQUEST_MS`` are logged as warnings. With ``INSTRUMENTATION`` off
+no engine listener, signal receiver or request hook is installed at all.
+
+Views declare how many statements they are allowed with
+:func:`query_budget`; going over the budget raises
+:class:`QueryBudgetExceeded` when the app is testing (or
+``QUERY_BUDGET_STRICT`` is set) and logs a warning otherwise.
+"""
+import logging
+from functools import wraps
+from time import perf_counter
+
+from flask import before_render_template, current_app, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+_thresholds = {"query": 0.1}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info["query_start"].pop()
+    if has_app_context():
+        g.query_count = g.get("query_count", 0) + 1
+        g.db_time = g.get("db_time", 0.0) + elapsed
+    if elapsed > _thresholds["query"]:
+        logger.warning("slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+
+def _render_started(sender, template, context, **extra):
+    g.setdefault("render_start", []).append(perf_counter())
+
+
+def _render_finished(sender, template, context, **extra):
+    g.render_time = g.get("render_time", 0.0) + perf_counter() - g.render_start.pop()
+
+
+def _request_started():
+    g.request_start = perf_counter()
+
+
+def _request_finished(response):
+    if "request_start" not in g:
+        return response
+    total = perf_counter() - g.request_start
+    db_time = g.get("db_time", 0.0)
+    count = query_count()
+    response.headers.add(
+        "Server-Timing",
+        'db;dur=%.1f;desc="%d queries", tpl;dur=%.1f, total;dur=%.1f'
+        % (db_time * 1000, count, g.get("render_time", 0.0) * 1000, total * 1000),
+    )
+    if total * 1000 > current_app.config["SLOW_REQUEST_MS"]:
+        logger.warning(
+            "slow request (%.1f ms, %d queries, %.1f ms in db): %s %s",
+            total * 1000,
+            count,
+            db_time * 1000,
+            request.method,
+            request.full_path,
+        )
+    return response
+
+
+def query_count():
+    return g.get("query_count", 0)
+
+
+def query_budget(limit):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            run = current_app.ensure_sync(view)
+            if not current_app.config["INSTRUMENTATION"]:
+                return run(*args, **kwargs)
+            start = query_count()
+            response = run(*args, **kwargs)
+            used = query_count() - start
+            if used > limit:
+                message = "%s ran %d queries, its budget is %d" % (
+                    request.endpoint,
+                    used,
+                    limit,
+                )
+                if current_app.testing or current_app.config["QUERY_BUDGET_STRICT"]:
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def init_app(app):
+    if not app.config["INSTRUMENTATION"]:
+        return
+    _thresholds["query"] = app.config["SLOW_QUERY_MS"] / 1000
+    if not event.contains(Engine, "before_cursor_execute", _before_execute):
+        event.listen(Engine, "before_cursor_execute", _before_execute)
+        event.listen(Engine, "after_cursor_execute", _after_execute)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.before_request(_request_started)
+    app.after_request(_request_finished)
@@ -0,0 +1,324 @@
+"""Prometheus-style metrics served at ``/metrics``.
+
+Every view is covered through request hooks, so nothing has to be added
+per route. Exposed series:
+
+* ``fyyur_http_requests_total{endpoint,method,status}``
+* ``fyyur_http_request_duration_seconds{endpoint}`` (histogram)
+* ``fyyur_http_requests_in_flight``
+* ``fyyur_db_pool_checkout_wait_seconds`` (histogram; QueuePool engines)
+* ``fyyur_cache_hits_total`` and ``fyyur_cache_misses_total``
+
+Updates take one short, uncontended lock per request. With several
+worker processes set ``METRICS_DIR`` to a directory shared by the
+workers: each process periodically writes its totals to
+``<METRICS_DIR>/<pid>.json`` and a scrape of any worker sums them.
+When a worker exits, the gunicorn master adds its totals to
+``<METRICS_DIR>/exited.json`` and removes its file (see
+:func:`fold_exited`), so counters of exited workers keep counting toward
+the totals, their in-flight gauge is dropped, and a later worker given
+the same pid starts a file of its own.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, request
+from sqlalchemy.pool import QueuePool
+
+from fyyur.cache import cache
+
+EXITED = "exited.json"
+# snapshots already in exited.json, remembered so a scrape that still
+# finds the worker's own file does not count it twice
+FOLDED_TOKENS = 100
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _histogram(buckets):
+    # per-bucket counts, then the sum and the count of observations
+    return [0] * len(buckets) + [0.0, 0]
+
+
+def _observe(histogram, buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            histogram[index] += 1
+            break
+    histogram[-2] += value
+    histogram[-1] += 1
+
+
+class Registry:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.latency = defaultdict(lambda: _histogram(LATENCY_BUCKETS))
+        self.pool_wait = _histogram(POOL_WAIT_BUCKETS)
+        self.in_flight = 0
+        # tells this process's snapshots from those of an earlier one
+        self.token = "%d-%d" % (os.getpid(), time.time_ns())
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, endpoint, method, status, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests["%s|%s|%s" % (endpoint, method, status)] += 1
+            _observe(self.latency[endpoint], LATENCY_BUCKETS, seconds)
+
+    def pool_checkout(self, seconds):
+        with self._lock:
+            _observe(self.pool_wait, POOL_WAIT_BUCKETS, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            stats = cache.stats()
+            return {
+                "requests": dict(self.requests),
+                "latency": {key: list(value) for key, value in self.latency.items()},
+                "pool_wait": list(self.pool_wait),
+                "in_flight": self.in_flight,
+                "cache": {"hits": stats["hits"], "misses": stats["misses"]},
+                "token": self.token,
+            }
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            registry.pool_checkout(time.perf_counter() - start)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _SnapshotFiles:
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self._written_at = 0.0
+        self._lock = threading.Lock()
+
+    def write(self, force=False):
+        # the threads of a worker finish requests at the same time; one
+        # of them writes, the others have nothing newer to add
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self._written_at < self.interval:
+                return
+            self._written_at = now
+            _dump(os.path.join(self.directory, "%d.json" % os.getpid()), registry.snapshot())
+        finally:
+            self._lock.release()
+
+    def others(self):
+        snapshots = []
+        for name in os.listdir(self.directory):
+            pid, extension = os.path.splitext(name)
+            if extension != ".json" or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            snapshot = _load(os.path.join(self.directory, name))
+            if snapshot is None:
+                continue
+            if not _alive(int(pid)):
+                snapshot["in_flight"] = 0
+            snapshots.append(snapshot)
+        # read last: a file missing above was folded in before it was removed
+        exited = _load(os.path.join(self.directory, EXITED))
+        if exited is not None:
+            folded = set(exited["folded"])
+            snapshots = [snapshot for snapshot in snapshots if snapshot.get("token") not in folded]
+            snapshots.append(exited)
+        return snapshots
+
+
+def _load(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _dump(path, snapshot):
+    # a temporary file of its own, so no other writer can replace or
+    # truncate it before it is moved into place
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def fold_exited(directory, pid):
+    """Add the totals of the exited worker ``pid`` to ``exited.json``.
+
+    Called by the gunicorn master once it has reaped the worker. The
+    worker's own file is removed afterwards.
+    """
+    path = os.path.join(directory, "%d.json" % pid)
+    snapshot = _load(path)
+    if snapshot is None:
+        return
+    exited = _load(os.path.join(directory, EXITED))
+    folded = [] if exited is None else exited["folded"]
+    total = _merge([snapshot] if exited is None else [exited, snapshot])
+    total["in_flight"] = 0
+    total["folded"] = (folded + [snapshot.get("token")])[-FOLDED_TOKENS:]
+    _dump(os.path.join(directory, EXITED), total)
+    os.remove(path)
+
+
+def _merge(snapshots):
+    total = {
+        "requests": defaultdict(int),
+        "latency": {},
+        "pool_wait": _histogram(POOL_WAIT_BUCKETS),
+        "in_flight": 0,
+        "cache": defaultdict(int),
+    }
+    for snapshot in snapshots:
+        for key, count in snapshot["requests"].items():
+            total["requests"][key] += count
+        for endpoint, histogram in snapshot["latency"].items():
+            merged = total["latency"].setdefault(endpoint, _histogram(LATENCY_BUCKETS))
+            for index, value in enumerate(histogram):
+                merged[index] += value
+        for index, value in enumerate(snapshot["pool_wait"]):
+            total["pool_wait"][index] += value
+        total["in_flight"] += snapshot["in_flight"]
+        for key, count in snapshot["cache"].items():
+            total["cache"][key] += count
+    return total
+
+
+def _histogram_lines(name, labels, buckets, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets, histogram):
+        cumulative += count
+        lines.append('%s_bucket{%sle="%s"} %d' % (name, labels, bound, cumulative))
+    lines.append('%s_bucket{%sle="+Inf"} %d' % (name, labels, histogram[-1]))
+    labels = "{%s}" % labels.rstrip(",") if labels else ""
+    lines.append("%s_sum%s %f" % (name, labels, histogram[-2]))
+    lines.append("%s_count%s %d" % (name, labels, histogram[-1]))
+    return lines
+
+
+def render(snapshot):
+    lines = [
+        "# HELP fyyur_http_requests_total Requests handled, by endpoint, method and status.",
+        "# TYPE fyyur_http_requests_total counter",
+    ]
+    for key, count in sorted(snapshot["requests"].items()):
+        endpoint, method, status = key.split("|")
+        lines.append(
+            'fyyur_http_requests_total{endpoint="%s",method="%s",status="%s"} %d'
+            % (endpoint, method, status, count)
+        )
+    lines += [
+        "# HELP fyyur_http_request_duration_seconds Request latency by endpoint.",
+        "# TYPE fyyur_http_request_duration_seconds histogram",
+    ]
+    for endpoint, histogram in sorted(snapshot["latency"].items()):
+        lines += _histogram_lines(
+            "fyyur_http_request_duration_seconds",
+            'endpoint="%s",' % endpoint,
+            LATENCY_BUCKETS,
+            histogram,
+        )
+    lines += [
+        "# HELP fyyur_http_requests_in_flight Requests currently being handled.",
+        "# TYPE fyyur_http_requests_in_flight gauge",
+        "fyyur_http_requests_in_flight %d" % snapshot["in_flight"],
+        "# HELP fyyur_db_pool_checkout_wait_seconds Time spent waiting for a pooled connection.",
+        "# TYPE fyyur_db_pool_checkout_wait_seconds histogram",
+    ]
+    lines += _histogram_lines(
+        "fyyur_db_pool_checkout_wait_seconds", "", POOL_WAIT_BUCKETS, snapshot["pool_wait"]
+    )
+    lines += [
+        "# HELP fyyur_cache_hits_total Response cache hits.",
+        "# TYPE fyyur_cache_hits_total counter",
+        "fyyur_cache_hits_total %d" % snapshot["cache"]["hits"],
+        "# HELP fyyur_cache_misses_total Response cache misses.",
+        "# TYPE fyyur_cache_misses_total counter",
+        "fyyur_cache_misses_total %d" % snapshot["cache"]["misses"],
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        # copied so the profile's class-level dict is left untouched
+        options = dict(app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+        options.setdefault("poolclass", TimedQueuePool)
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+    files = None
+    if app.config["METRICS_DIR"]:
+        os.makedirs(app.config["METRICS_DIR"], exist_ok=True)
+        files = _SnapshotFiles(app.config["METRICS_DIR"], app.config["METRICS_FLUSH_SECONDS"])
+        atexit.register(lambda: files.write(force=True))
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        registry.request_started()
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _record_request(error):
+        if "metrics_start" not in g:
+            return
+        registry.request_finished(
+            request.endpoint or "unmatched",
+            request.method,
+            g.get("metrics_status", 500),
+            time.perf_counter() - g.metrics_start,
+        )
+        if files is not None:
+            files.write()
+
+    @app.route("/metrics")
+    def metrics():
+        snapshots = [registry.snapshot()]
+        if files is not None:
+            snapshots += files.others()
+        return Response(render(_merge(snapshots)), mimetype="text/plain; version=0.0.4")
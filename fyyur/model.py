@@ -1,8 +1,22 @@
+from datetime import datetime
+
 from fyyur import db
 
+# SQLite has no ARRAY type; storing genres as JSON there keeps the models
+# usable against a local stand-in database.
+StringArray = db.ARRAY(db.String).with_variant(db.JSON, 'sqlite')
+
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        # covers the /venues listing, ordered by area and name
+        db.Index('ix_Venue_state_city_name', 'state', 'city', 'name',
+                 postgresql_include=['id', 'upcoming_shows_count']),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer(), primary_key=True)
     name = db.Column(db.String())
@@ -10,33 +24,58 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(StringArray, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(320))
     seeking_talent = db.Column(db.String())
     seeking_description = db.Column(db.String())
-    show = db.relationship('Show', backref=db.backref('venue', lazy='joined'), lazy='joined')
+    # maintained by fyyur/counters.py as of ShowCounterClock.rolled_at
+    upcoming_shows_count = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    show = db.relationship('Show', backref='venue')
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer(), primary_key=True)
     name = db.Column(db.String())
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(StringArray, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(320))
     seeking_venue = db.Column(db.String())
     seeking_description = db.Column(db.String())
-    show = db.relationship('Show', backref=db.backref('artist', lazy='joined'), lazy='joined')
+    # maintained by fyyur/counters.py as of ShowCounterClock.rolled_at
+    upcoming_shows_count = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    show = db.relationship('Show', backref='artist')
             
 class Show(db.Model):
   __tablename__ = 'Show'
+  __table_args__ = (
+      db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+      db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+      db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+  )
   id = db.Column(db.Integer(), primary_key=True)
   artist_id = db.Column(db.Integer(), db.ForeignKey('Artist.id'), nullable=False)
   venue_id = db.Column(db.Integer(), db.ForeignKey('Venue.id'), nullable=False)
   start_time = db.Column(db.DateTime())
+  updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ShowCounterClock(db.Model):
+  __tablename__ = 'ShowCounterClock'
+  id = db.Column(db.Integer(), primary_key=True)
+  rolled_at = db.Column(db.DateTime(), nullable=False)
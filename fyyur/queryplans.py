@@ -0,0 +1,100 @@
+"""Query plan checks for the hot read routes.
+
+Each route is requested through the test client while its SELECT
+statements are captured, then every statement is run through
+``EXPLAIN (FORMAT JSON)`` with sequential scans disabled, so the report
+shows which indexes the planner can use for it even on a small dataset.
+"""
+from sqlalchemy import event
+
+from fyyur import db
+from fyyur.model import Artist, Venue
+
+# Indexes each route is expected to reach. /venues reads the show counters
+# stored on Venue and never touches Show; it walks ix_Venue_state_city_name
+# in listing order. ix_Venue_genres and
+# ix_Artist_genres serve genre containment (genres @> ARRAY[...]) lookups,
+# which no HTML route issues yet.
+EXPECTED_INDEXES = {
+    "venues": {"ix_Venue_state_city_name"},
+    "show_venue": {"ix_Show_venue_id_start_time"},
+    "show_artist": {"ix_Show_artist_id_start_time"},
+    "shows": {"ix_Show_start_time_id"},
+    "search_venues": {"ix_Venue_name_trgm", "ix_Venue_city_trgm", "ix_Venue_search_document"},
+    "search_artists": {"ix_Artist_name_trgm", "ix_Artist_city_trgm", "ix_Artist_search_document"},
+}
+
+
+class NoSampleData(Exception):
+    pass
+
+
+def _plan_indexes(plan):
+    found = set()
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            found.add(node["Index Name"])
+        nodes.extend(node.get("Plans", ()))
+    return found
+
+
+def _captured_selects(engine, send):
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        send()
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    return statements
+
+
+def _sample_requests():
+    venue = db.session.query(Venue.id, Venue.name).order_by(Venue.id).first()
+    artist = db.session.query(Artist.id, Artist.name).order_by(Artist.id).first()
+    if venue is None or artist is None:
+        raise NoSampleData("at least one venue and one artist are needed")
+    return [
+        ("venues", "GET", "/venues", None),
+        ("show_venue", "GET", "/venues/%d" % venue.id, None),
+        ("show_artist", "GET", "/artists/%d" % artist.id, None),
+        ("shows", "GET", "/shows", None),
+        ("search_venues", "POST", "/venues/search", {"search_term": venue.name[:4]}),
+        ("search_artists", "POST", "/artists/search", {"search_term": artist.name[:4]}),
+    ]
+
+
+def check_routes(app):
+    """Yield ``(endpoint, url, used_indexes, missing_indexes)`` per route."""
+    engine = db.engine
+    client = app.test_client()
+    # keep every statement on this engine (and its paramstyle) rather than
+    # the async engines of fyyur.aio
+    async_queries = app.config["ASYNC_QUERIES"]
+    app.config["ASYNC_QUERIES"] = False
+    try:
+        yield from _check_routes(engine, client)
+    finally:
+        app.config["ASYNC_QUERIES"] = async_queries
+
+
+def _check_routes(engine, client):
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        for endpoint, method, url, form in _sample_requests():
+            statements = _captured_selects(
+                engine, lambda: client.open(url, method=method, data=form)
+            )
+            used = set()
+            for statement, parameters in statements:
+                plan = connection.exec_driver_sql(
+                    "EXPLAIN (FORMAT JSON) " + statement, parameters
+                ).scalar()
+                used |= _plan_indexes(plan[0]["Plan"])
+            yield endpoint, url, used, EXPECTED_INDEXES[endpoint] - used
@@ -0,0 +1,89 @@
+"""Read/write routing between the primary database and a read replica.
+
+With a ``"replica"`` entry in ``SQLALCHEMY_BINDS`` the session sends
+reads made while handling GET and HEAD requests, and requests to views
+marked with :func:`replica_reads`, to the replica. Everything else goes
+to the primary:
+
+* flushes and INSERT/UPDATE/DELETE statements;
+* every statement after the current request has written;
+* reads outside a request (CLI commands, migrations, counters);
+* all requests from a client for ``READ_YOUR_WRITES_SECONDS`` after it
+  last wrote, so users see their own changes despite replication lag.
+
+The last write time is kept in the signed session cookie. Other clients
+may read data that is behind by the replication lag, and cached pages
+rendered from the replica keep it for up to ``CACHE_DEFAULT_TTL``.
+Without a replica bind every statement goes to the primary.
+"""
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA = "replica"
+WROTE_AT = "_wrote_at"
+
+
+def replica_reads(view):
+    """Let a non-GET view that only reads (such as a search form) use the replica."""
+    view.replica_reads = True
+    return view
+
+
+def pinned_to_primary():
+    """True while the current client is inside its read-your-writes window."""
+    if not current_app.config["SQLALCHEMY_BINDS"].get(REPLICA):
+        return False
+    if g.get("wrote"):
+        return True
+    wrote_at = session.get(WROTE_AT)
+    return (
+        wrote_at is not None
+        and time.time() - wrote_at < current_app.config["READ_YOUR_WRITES_SECONDS"]
+    )
+
+
+def reads_from_replica():
+    """True when reads for the current request should go to the replica."""
+    if not has_request_context() or not current_app.config["SQLALCHEMY_BINDS"].get(REPLICA):
+        return False
+    if request.method not in ("GET", "HEAD"):
+        view = current_app.view_functions.get(request.endpoint)
+        if not getattr(view, "replica_reads", False):
+            return False
+    return not pinned_to_primary()
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and reads_from_replica()
+        ):
+            return get_state(self.app).db.get_engine(self.app, bind=REPLICA)
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_write(session, flush_context):
+    if has_request_context():
+        g.wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def _remember_write(response):
+    if g.get("wrote"):
+        session[WROTE_AT] = time.time()
+    return response
+
+
+def init_app(app):
+    app.after_request(_remember_write)
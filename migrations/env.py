@@ -71,6 +71,14 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # expression indexes (e.g. the full-text search documents) cannot be
+    # declared on the models, so leave indexes that only exist in the
+    # database alone instead of autogenerating drops for them
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'index' and reflected and compare_to is None:
+            return False
+        return True
+
     connectable = current_app.extensions['migrate'].db.get_engine()
 
     with connectable.connect() as connection:
@@ -78,6 +86,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
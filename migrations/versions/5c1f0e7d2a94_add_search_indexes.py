@@ -0,0 +1,57 @@
+"""add search indexes
+
+Revision ID: 5c1f0e7d2a94
+Revises: 3a3aac74d428
+Create Date: 2026-10-18 09:12:31.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f0e7d2a94'
+down_revision = '3a3aac74d428'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # array_to_string() is only STABLE, so the search document is wrapped in
+    # an IMMUTABLE function to make it indexable. fyyur/search.py must call
+    # it with the same arguments for the planner to match the index.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_search_document(name text, city text, genres text[])
+        RETURNS tsvector
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$
+            SELECT to_tsvector('simple',
+                coalesce(name, '') || ' ' ||
+                coalesce(city, '') || ' ' ||
+                coalesce(array_to_string(genres, ' '), ''))
+        $$
+    """)
+
+    for table in ('Venue', 'Artist'):
+        for column in ('name', 'city'):
+            op.create_index(
+                'ix_{}_{}_trgm'.format(table, column), table, [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+            )
+        op.create_index(
+            'ix_{}_search_document'.format(table), table,
+            [sa.text('fyyur_search_document(name, city, genres)')],
+            postgresql_using='gin',
+        )
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index('ix_{}_search_document'.format(table), table_name=table)
+        op.drop_index('ix_{}_city_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_document(text, text, text[])')
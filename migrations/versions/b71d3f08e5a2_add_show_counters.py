@@ -0,0 +1,53 @@
+"""add show counters
+
+Revision ID: b71d3f08e5a2
+Revises: 9e4b27c6d813
+Create Date: 2026-10-18 14:02:55.127840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d3f08e5a2'
+down_revision = '9e4b27c6d813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowCounterClock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill as of the clock row inserted here; start times are naive
+    # UTC, so the clock is too
+    op.execute(
+        'INSERT INTO "ShowCounterClock" (id, rolled_at) '
+        "VALUES (1, timezone('utc', now()))"
+    )
+    for table, foreign_key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute("""
+            UPDATE "{table}" SET
+                upcoming_shows_count = (
+                    SELECT count(*) FROM "Show"
+                    WHERE "Show".{foreign_key} = "{table}".id
+                    AND "Show".start_time > (SELECT rolled_at FROM "ShowCounterClock")),
+                past_shows_count = (
+                    SELECT count(*) FROM "Show"
+                    WHERE "Show".{foreign_key} = "{table}".id
+                    AND "Show".start_time <= (SELECT rolled_at FROM "ShowCounterClock"))
+        """.format(table=table, foreign_key=foreign_key))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('ShowCounterClock')
@@ -0,0 +1,31 @@
+"""add updated_at
+
+Revision ID: c42a9d15f7e0
+Revises: b71d3f08e5a2
+Create Date: 2026-10-18 16:25:43.581106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c42a9d15f7e0'
+down_revision = 'b71d3f08e5a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the application writes naive UTC timestamps; the server default only
+    # backfills existing rows and covers inserts made outside the ORM
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text("timezone('utc', now())"),
+        ))
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,30 @@
+"""venue listing index
+
+Revision ID: d83f51b2c6a0
+Revises: c42a9d15f7e0
+Create Date: 2026-10-18 21:05:12.448310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd83f51b2c6a0'
+down_revision = 'c42a9d15f7e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /venues orders by (state, city, name), which (city, state) cannot serve
+    op.drop_index('ix_Venue_city_state', table_name='Venue')
+    op.create_index(
+        'ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name'], unique=False,
+        postgresql_include=['id', 'upcoming_shows_count'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city_name', table_name='Venue')
+    op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state'], unique=False)
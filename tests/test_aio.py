@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+import config
+from benchmarks.datagen import generate
+from fyyur import aio, create_app, db
+from fyyur.metrics import registry
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # the async engines open connections of their own, which an in-memory
+    # database would not share
+    monkeypatch.setattr(
+        config.TestingConfig, "SQLALCHEMY_DATABASE_URI", "sqlite:///%s" % (tmp_path / "aio.db")
+    )
+    monkeypatch.setattr(config.TestingConfig, "ASYNC_QUERIES", True)
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        generate(0.1)
+    aio._engines.clear()
+    yield app
+    aio._engines.clear()
+
+
+def test_concurrent_requests_share_a_fresh_engine(app):
+    statuses = []
+    waits_before = registry.pool_wait[-1]
+
+    def browse():
+        client = app.test_client()
+        for id in range(1, 6):
+            statuses.append(client.get("/venues/%d" % id).status_code)
+            statuses.append(client.post("/venues/search", data={"search_term": "a"}).status_code)
+
+    threads = [threading.Thread(target=browse) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 80
+    assert registry.pool_wait[-1] - waits_before == 80
+    engine, slots, _ = aio._engines[app.config["SQLALCHEMY_DATABASE_URI"]]
+    assert slots.free == slots.size
@@ -0,0 +1,44 @@
+from collections import Counter
+
+import pytest
+
+from benchmarks.datagen import generate
+from fyyur import api
+from fyyur.model import Show, Venue
+
+
+@pytest.fixture
+def app(app):
+    generate(0.1)
+    return app
+
+
+def _pages(client, resource, limit, **params):
+    after = None
+    while True:
+        query = dict(params, limit=limit, **({"after": after} if after else {}))
+        body = client.get("/api/v1/%s" % resource, query_string=query).get_json()
+        yield body["data"]
+        after = body["next"]
+        if after is None:
+            return
+
+
+@pytest.mark.parametrize("resource, model", [("shows", Show), ("venues", Venue)])
+def test_pages_cover_every_row_once(client, resource, model):
+    ids = [item["id"] for page in _pages(client, resource, 7) for item in page]
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(row.id for row in model.query)
+
+
+def test_embedded_shows_are_capped(client, monkeypatch):
+    monkeypatch.setattr(api, "EMBED_LIMIT", 2)
+    per_venue = Counter(show.venue_id for show in Show.query)
+    pages = _pages(client, "venues", 50, include="shows")
+    for venue in (item for page in pages for item in page):
+        shows = venue["shows"]
+        assert len(shows) == min(per_venue[venue["id"]], 2)
+        assert all(show["venue_id"] == venue["id"] for show in shows)
+        assert [show["start_time"] for show in shows] == sorted(
+            (show["start_time"] for show in shows), reverse=True
+        )
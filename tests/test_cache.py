@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+
+from benchmarks.datagen import generate
+from fyyur import db
+from fyyur.cache import cache
+from fyyur.model import Artist, Venue
+
+VENUE_FORM = {
+    "city": "Oakland",
+    "state": "CA",
+    "address": "1 Main St",
+    "phone": "555-0100",
+    "genres": "Jazz",
+    "facebook_link": "",
+    "website_link": "",
+    "image_link": "",
+    "seeking_talent": "",
+    "seeking_description": "",
+}
+
+
+@pytest.fixture
+def app(app):
+    app.config["CACHE_BACKEND"] = "lru"
+    cache.init_app(app)
+    generate(0.1)
+    yield app
+    cache.init_app(app)
+
+
+@pytest.fixture
+def reader(app):
+    # a second visitor: no flashed messages, no session of the writer's
+    return app.test_client()
+
+
+def _stats_since(before):
+    after = cache.stats()
+    return after["hits"] - before["hits"], after["misses"] - before["misses"]
+
+
+def test_repeated_reads_are_served_from_the_cache(reader):
+    before = cache.stats()
+    first = reader.get("/venues")
+    second = reader.get("/venues")
+    assert second.data == first.data
+    assert _stats_since(before) == (1, 1)
+
+
+def test_created_venue_is_listed_on_the_next_read(client, reader):
+    reader.get("/venues")
+    client.post("/venues/create", data=dict(VENUE_FORM, name="Brand New Hall"))
+    before = cache.stats()
+    assert b"Brand New Hall" in reader.get("/venues").data
+    assert _stats_since(before) == (0, 1)
+
+
+def test_edited_venue_is_shown_on_the_next_read(client, reader):
+    venue_id = Venue.query.first().id
+    reader.get("/venues/%d" % venue_id)
+    client.post("/venues/%d/edit" % venue_id, data=dict(VENUE_FORM, name="Renamed Hall"))
+    assert b"Renamed Hall" in reader.get("/venues/%d" % venue_id).data
+    assert b"Renamed Hall" in reader.get("/venues").data
+
+
+def test_write_without_invalidation_is_not_served_stale(reader):
+    # as when another process wrote: this cache's tag generations are unchanged
+    artist = Artist.query.first()
+    page = reader.get("/artists/%d" % artist.id)
+    artist.name = "Quietly Renamed"
+    db.session.commit()
+
+    response = reader.get("/artists/%d" % artist.id)
+    assert b"Quietly Renamed" in response.data
+    assert response.headers["ETag"] != page.headers["ETag"]
+    revalidated = reader.get(
+        "/artists/%d" % artist.id, headers={"If-None-Match": page.headers["ETag"]}
+    )
+    assert revalidated.status_code == 200
+
+
+def test_lru_backend_is_refused_with_several_workers(app):
+    app.config["WORKERS"] = 4
+    with pytest.raises(ValueError):
+        cache.init_app(app)
+    app.config["WORKERS"] = 1
+
+
+def test_deleting_a_venue_invalidates_every_page_tagged_for_it(client, reader):
+    client.post("/venues/create", data=dict(VENUE_FORM, name="Short Lived Hall"))
+    venue_id = Venue.query.filter_by(name="Short Lived Hall").one().id
+    # not the newest venue, so deleting it leaves the /shows ETag alone
+    db.session.execute(
+        Venue.__table__.update()
+        .where(Venue.id == venue_id)
+        .values(updated_at=datetime(2000, 1, 1))
+    )
+    db.session.commit()
+    for path in ("/venues", "/shows", "/venues/%d" % venue_id):
+        reader.get(path).get_data()
+
+    client.delete("/venues/%d" % venue_id)
+    before = cache.stats()
+    assert b"Short Lived Hall" not in reader.get("/venues").data
+    # /shows renders the same data under the same ETag, yet its tag was
+    # bumped with the others
+    reader.get("/shows").get_data()
+    assert _stats_since(before) == (0, 2)
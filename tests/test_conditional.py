@@ -0,0 +1,85 @@
+import pytest
+
+from benchmarks.datagen import generate
+from fyyur.model import Show
+
+VENUE_FORM = {
+    "name": "Renamed Hall",
+    "city": "Oakland",
+    "state": "CA",
+    "address": "1 Main St",
+    "phone": "555-0100",
+    "genres": "Jazz",
+}
+
+
+@pytest.fixture
+def app(app):
+    generate(0.1)
+    return app
+
+
+@pytest.fixture
+def show(app):
+    show = Show.query.order_by(Show.id).first()
+    return show.venue_id, show.artist_id
+
+
+@pytest.fixture
+def reader(app):
+    # a visitor without flashed messages, whose pages are cacheable
+    return app.test_client()
+
+
+def _get(client, path, **headers):
+    response = client.get(path, headers=headers)
+    # streamed pages finish rendering as their body is read
+    response.get_data()
+    response.close()
+    return response
+
+
+def _pages(show):
+    venue_id, artist_id = show
+    return ["/venues", "/artists", "/shows", "/venues/%d" % venue_id, "/artists/%d" % artist_id]
+
+
+def test_matching_etag_is_answered_with_304(reader, show):
+    for path in _pages(show):
+        page = _get(reader, path)
+        assert page.status_code == 200, path
+        revalidated = _get(reader, path, **{"If-None-Match": page.headers["ETag"]})
+        assert revalidated.status_code == 304, path
+        assert revalidated.data == b"", path
+        assert revalidated.headers["ETag"] == page.headers["ETag"], path
+
+
+def test_last_modified_is_answered_with_304(reader, show):
+    path = "/venues/%d" % show[0]
+    page = _get(reader, path)
+    revalidated = _get(reader, path, **{"If-Modified-Since": page.headers["Last-Modified"]})
+    assert revalidated.status_code == 304
+
+
+def test_editing_a_venue_changes_the_etags_of_its_pages(client, reader, show):
+    venue_id, artist_id = show
+    etags = {path: _get(reader, path).headers["ETag"] for path in _pages(show)}
+    client.post("/venues/%d/edit" % venue_id, data=VENUE_FORM)
+
+    changed = {path for path in etags if _get(reader, path).headers["ETag"] != etags[path]}
+    # the artist page lists the venue's name through the show
+    assert changed == {"/venues", "/shows", "/venues/%d" % venue_id, "/artists/%d" % artist_id}
+    path = "/venues/%d" % venue_id
+    page = _get(reader, path, **{"If-None-Match": etags[path]})
+    assert page.status_code == 200
+    assert b"Renamed Hall" in page.data
+
+
+def test_listing_a_show_changes_the_etags_of_its_pages(client, reader, show):
+    venue_id, artist_id = show
+    paths = ["/shows", "/venues/%d" % venue_id, "/artists/%d" % artist_id]
+    etags = {path: _get(reader, path).headers["ETag"] for path in paths}
+    form = {"venue_id": venue_id, "artist_id": artist_id, "start_time": "2099-01-01 20:00:00"}
+    client.post("/shows/create", data=form)
+    for path in paths:
+        assert _get(reader, path).headers["ETag"] != etags[path], path
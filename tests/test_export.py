@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.datagen import generate
+
+
+@pytest.fixture
+def app(app):
+    app.config["EXPORT_TOKEN"] = "s3cret"
+    generate(0.1)
+    return app
+
+
+@pytest.mark.parametrize(
+    "authorization", [None, "Bearer wrong", "Bearer s3crét", "Bearer ☃"]
+)
+def test_wrong_token_is_refused(client, authorization):
+    headers = {} if authorization is None else {"Authorization": authorization}
+    assert client.get("/export/venues.csv", headers=headers).status_code == 401
+
+
+def test_token_opens_the_export(client):
+    response = client.get("/export/venues.csv", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.data.startswith(b"id,")
@@ -0,0 +1,85 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from fyyur import metrics
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _snapshot(token, requests, in_flight=0):
+    return {
+        "requests": {"index|GET|200": requests},
+        "latency": {},
+        "pool_wait": metrics._histogram(metrics.POOL_WAIT_BUCKETS),
+        "in_flight": in_flight,
+        "cache": {"hits": 0, "misses": 0},
+        "token": token,
+    }
+
+
+def _total(files):
+    return metrics._merge(files.others())["requests"]["index|GET|200"]
+
+
+@pytest.fixture
+def files(tmp_path):
+    return metrics._SnapshotFiles(str(tmp_path), interval=0)
+
+
+def test_exited_workers_are_folded_into_one_file(tmp_path, files):
+    for requests in (3, 5, 7):
+        pid = _dead_pid()
+        metrics._dump(str(tmp_path / ("%d.json" % pid)), _snapshot("w%d" % requests, requests, 1))
+        metrics.fold_exited(str(tmp_path), pid)
+
+    assert [path.name for path in tmp_path.iterdir()] == [metrics.EXITED]
+    assert _total(files) == 15
+    assert metrics._merge(files.others())["in_flight"] == 0
+
+
+def test_reused_pid_does_not_take_the_exited_totals(tmp_path, files):
+    pid = _dead_pid()
+    path = str(tmp_path / ("%d.json" % pid))
+    metrics._dump(path, _snapshot("old", 10))
+    metrics.fold_exited(str(tmp_path), pid)
+    metrics._dump(path, _snapshot("new", 1))
+    assert _total(files) == 11
+
+
+def test_scrape_during_a_fold_counts_the_worker_once(tmp_path, files):
+    pid = _dead_pid()
+    path = str(tmp_path / ("%d.json" % pid))
+    metrics._dump(path, _snapshot("worker", 4))
+    metrics.fold_exited(str(tmp_path), pid)
+    # as if the scrape listed the directory before the file was removed
+    metrics._dump(path, _snapshot("worker", 4))
+    assert _total(files) == 4
+
+
+def test_concurrent_flushes_do_not_collide(tmp_path):
+    files = metrics._SnapshotFiles(str(tmp_path), interval=0)
+    errors = []
+
+    def flush():
+        try:
+            for _ in range(200):
+                files.write(force=True)
+                metrics._dump(str(tmp_path / "shared.json"), _snapshot("t", 1))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=flush) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [".json", ".json"]
@@ -0,0 +1,30 @@
+import sys
+
+import click
+from click.testing import CliRunner
+from flask.cli import FlaskGroup
+
+import config
+from fyyur import create_app
+
+
+def test_served_app_leaves_migrate_out():
+    assert "migrate" not in create_app("testing").extensions
+
+
+def test_migrate_switch_registers_it(monkeypatch):
+    monkeypatch.setattr(config.TestingConfig, "MIGRATE", True)
+    assert "migrate" in create_app("testing").extensions
+
+
+def test_cli_registers_it_before_flask_migrate_is_imported(monkeypatch):
+    monkeypatch.delitem(sys.modules, "flask_migrate", raising=False)
+    with click.Context(click.Command("db")):
+        app = create_app("testing")
+    assert "migrate" in app.extensions
+
+
+def test_flask_db_runs():
+    cli = FlaskGroup(create_app=lambda: create_app("testing"))
+    result = CliRunner().invoke(cli, ["db", "current"])
+    assert result.exit_code == 0, result.output
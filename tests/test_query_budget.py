@@ -0,0 +1,47 @@
+import pytest
+
+from benchmarks.datagen import generate
+from fyyur.instrumentation import QueryBudgetExceeded, query_budget
+from fyyur.model import Artist, Venue
+
+# Under the testing profile a view going over its query budget raises
+# QueryBudgetExceeded, which the test client lets through.
+BUDGETED_GETS = [
+    "/venues",
+    "/venues/{venue}",
+    "/venues/{venue}/edit",
+    "/artists",
+    "/artists/{artist}",
+    "/artists/{artist}/edit",
+    "/shows",
+]
+BUDGETED_SEARCHES = ["/venues/search", "/artists/search"]
+
+
+@pytest.fixture
+def catalogue(app):
+    generate(0.1)
+    return {"venue": Venue.query.first().id, "artist": Artist.query.first().id}
+
+
+@pytest.mark.parametrize("url", BUDGETED_GETS)
+def test_budgeted_page_stays_within_its_budget(client, catalogue, url):
+    assert client.get(url.format(**catalogue)).status_code == 200
+
+
+@pytest.mark.parametrize("url", BUDGETED_SEARCHES)
+@pytest.mark.parametrize("term", ["", "blue", "city 1"])
+def test_budgeted_search_stays_within_its_budget(client, catalogue, url, term):
+    assert client.post(url, data={"search_term": term}).status_code == 200
+
+
+def test_going_over_the_budget_fails(app, client, catalogue):
+    @query_budget(1)
+    def two_queries():
+        Venue.query.count()
+        Artist.query.count()
+        return "ok"
+
+    app.add_url_rule("/two-queries", view_func=two_queries)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/two-queries")
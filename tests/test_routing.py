@@ -0,0 +1,100 @@
+import pytest
+
+import config
+from fyyur import create_app, db
+from fyyur.model import Artist, Venue
+from fyyur.routing import REPLICA
+
+VENUE_FORM = {
+    "name": "Edited Hall",
+    "city": "Oakland",
+    "state": "CA",
+    "address": "1 Main St",
+    "phone": "555-0100",
+    "genres": "Jazz",
+}
+
+
+def _seed(engine, suffix):
+    # the same ids in both databases, with names telling them apart
+    db.Model.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            Venue.__table__.insert(),
+            {"id": 1, "name": "Hall " + suffix, "city": "Oakland", "state": "CA", "genres": []},
+        )
+        connection.execute(
+            Artist.__table__.insert(),
+            {"id": 1, "name": "Trio " + suffix, "city": "Oakland", "state": "CA", "genres": []},
+        )
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        config.TestingConfig, "SQLALCHEMY_DATABASE_URI", "sqlite:///%s" % (tmp_path / "primary.db")
+    )
+    monkeypatch.setattr(
+        config.TestingConfig,
+        "SQLALCHEMY_BINDS",
+        {REPLICA: "sqlite:///%s" % (tmp_path / "replica.db")},
+    )
+    app = create_app("testing")
+    with app.app_context():
+        _seed(db.get_engine(app), "Primary")
+        _seed(db.get_engine(app, bind=REPLICA), "Replica")
+    # no app context around the requests: each gets its own, and with it
+    # its own g and session, as when served
+    return app
+
+
+@pytest.mark.parametrize(
+    "method, path, data",
+    [
+        ("GET", "/venues", None),
+        ("GET", "/venues/1", None),
+        ("GET", "/artists/1", None),
+        ("POST", "/venues/search", {"search_term": "Hall"}),
+        ("POST", "/artists/search", {"search_term": "Trio"}),
+    ],
+)
+def test_reads_go_to_the_replica(client, method, path, data):
+    page = client.open(path, method=method, data=data).get_data(as_text=True)
+    assert "Replica" in page
+    assert "Primary" not in page
+
+
+def test_writes_go_to_the_primary(app, client):
+    client.post("/venues/1/edit", data=VENUE_FORM)
+    names = {
+        bind: db.get_engine(app, bind=bind).execute(
+            Venue.__table__.select().with_only_columns(Venue.name)
+        ).scalar()
+        for bind in (None, REPLICA)
+    }
+    assert names == {None: "Edited Hall", REPLICA: "Hall Replica"}
+
+
+def test_writer_reads_its_writes_from_the_primary(app, client):
+    client.post("/venues/1/edit", data=VENUE_FORM)
+    assert "Edited Hall" in client.get("/venues/1").get_data(as_text=True)
+    assert "Trio Primary" in client.post(
+        "/artists/search", data={"search_term": "Trio"}
+    ).get_data(as_text=True)
+
+
+def test_other_clients_keep_reading_the_replica(app, client):
+    client.post("/venues/1/edit", data=VENUE_FORM)
+    page = app.test_client().get("/venues/1").get_data(as_text=True)
+    assert "Hall Replica" in page
+
+
+def test_writer_returns_to_the_replica_after_the_window(app, client):
+    app.config["READ_YOUR_WRITES_SECONDS"] = 0
+    client.post("/venues/1/edit", data=VENUE_FORM)
+    assert "Hall Replica" in client.get("/venues/1").get_data(as_text=True)
+
+
+def test_replica_url_gets_the_primarys_scheme_fix(monkeypatch):
+    monkeypatch.setenv("REPLICA_DATABASE_URL", "postgres://user@replica/fyyur")
+    assert config.database_url(None, "REPLICA_DATABASE_URL") == "postgresql://user@replica/fyyur"
@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from fyyur import db
+from fyyur.model import Artist, Show, Venue
+
+
+@pytest.fixture
+def venue_and_artist(app):
+    venue = Venue(name="Clock Hall", city="Paris", state="CA", genres=[])
+    artist = Artist(name="Clock Trio", city="Paris", state="CA", genres=[])
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    return venue.id, artist.id
+
+
+@pytest.fixture
+def server_far_from_utc(monkeypatch):
+    # the server's local time is 14 hours ahead of UTC
+    monkeypatch.setenv("TZ", "Pacific/Kiritimati")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_show_entered_in_the_visitors_zone_is_stored_in_utc(client, venue_and_artist):
+    venue_id, artist_id = venue_and_artist
+    client.set_cookie("localhost", "tz", "Europe/Paris")
+    form = {"venue_id": venue_id, "artist_id": artist_id, "start_time": "2030-06-01 20:00:00"}
+    client.post("/shows/create", data=form)
+
+    assert Show.query.one().start_time == datetime(2030, 6, 1, 18, 0)
+    assert "8:00:00 PM" in client.get("/venues/%d" % venue_id).get_data(as_text=True)
+
+
+def test_upcoming_is_decided_in_utc(client, venue_and_artist, server_far_from_utc):
+    venue_id, artist_id = venue_and_artist
+    soon = datetime.utcnow() + timedelta(hours=1)
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=soon))
+    db.session.commit()
+
+    page = client.get("/venues/%d" % venue_id).get_data(as_text=True)
+    assert "1 Upcoming Show" in page
+    assert "0 Past Shows" in page
+    assert db.session.get(Venue, venue_id).upcoming_shows_count == 1
@@ -0,0 +1,92 @@
+import pytest
+
+from fyyur import typeahead
+from fyyur.model import Artist, Venue
+from fyyur.typeahead import ARTIST, MAX_SCAN, VENUE, PrefixIndex
+
+FORM = {"city": "Oakland", "state": "CA", "phone": "555-0100", "genres": "Jazz"}
+
+
+def _index(names):
+    index = PrefixIndex()
+    index.load([(VENUE, id, name) for id, name in enumerate(names)])
+    return index
+
+
+def test_every_word_must_prefix_a_word_of_the_name():
+    index = _index(["Blue Hall", "Blue Room", "Golden Hall"])
+    assert index.suggest("hall bl") == [(VENUE, 0, "Blue Hall")]
+    assert index.suggest("hall zq") == []
+
+
+def test_the_most_selective_word_is_scanned():
+    index = _index(["Hall %d" % id for id in range(MAX_SCAN * 2)] + ["Hall Zq"])
+    assert index.suggest("hall zq") == [(VENUE, MAX_SCAN * 2, "Hall Zq")]
+
+
+def test_whole_words_are_found_past_the_scan_cap():
+    names = ["Blue %d" % id for id in range(MAX_SCAN)]
+    names += ["Hall %d" % id for id in range(MAX_SCAN)]
+    index = _index(names + ["Blue Hall"])
+    # both words prefix MAX_SCAN + 1 keys; the match sorts last in each
+    assert index.suggest("blue hall") == [(VENUE, MAX_SCAN * 2, "Blue Hall")]
+    assert index.suggest("hall blue") == [(VENUE, MAX_SCAN * 2, "Blue Hall")]
+    assert index.suggest("blue 7") == [(VENUE, 7, "Blue 7")] + [
+        (VENUE, id, "Blue %d" % id) for id in range(70, 79)
+    ]
+
+
+def test_whole_word_matches_come_first():
+    index = _index(["Hallway", "Hall of Fame"])
+    assert index.suggest("hall") == [(VENUE, 1, "Hall of Fame"), (VENUE, 0, "Hallway")]
+
+
+def test_writes_replace_the_entry():
+    index = _index(["Blue Hall"])
+    index.add(ARTIST, 7, "Blue Trio")
+    index.add(VENUE, 0, "Red Hall")
+    assert index.suggest("blue") == [(ARTIST, 7, "Blue Trio")]
+    index.remove(ARTIST, 7)
+    assert index.suggest("blue") == []
+    assert index.suggest("red hall") == [(VENUE, 0, "Red Hall")]
+    assert len(index) == 1
+
+
+@pytest.fixture
+def fresh_index(app, monkeypatch):
+    # the index is per process; start each test from this app's database
+    monkeypatch.setattr(typeahead, "index", PrefixIndex())
+    monkeypatch.setattr(typeahead, "_loaded", False)
+
+
+def _suggested(client, query):
+    response = client.get("/search/suggest", query_string={"q": query})
+    return [(item["type"], item["name"]) for item in response.get_json()["data"]]
+
+
+def test_created_names_are_suggested(client, fresh_index):
+    assert _suggested(client, "zeph") == []
+    client.post("/venues/create", data=dict(FORM, name="Zephyr Lounge"))
+    client.post("/artists/create", data=dict(FORM, name="Zephyr Trio"))
+    assert sorted(_suggested(client, "zeph")) == [
+        (ARTIST, "Zephyr Trio"),
+        (VENUE, "Zephyr Lounge"),
+    ]
+
+
+def test_edited_and_deleted_names_are_updated(client, fresh_index):
+    client.post("/venues/create", data=dict(FORM, name="Zephyr Lounge"))
+    venue_id = Venue.query.filter_by(name="Zephyr Lounge").one().id
+    client.post("/venues/%d/edit" % venue_id, data=dict(FORM, name="Aurora Lounge"))
+    assert _suggested(client, "zeph") == []
+    assert _suggested(client, "lounge aur") == [(VENUE, "Aurora Lounge")]
+
+    client.delete("/venues/%d" % venue_id)
+    assert _suggested(client, "aurora") == []
+
+
+def test_edited_artist_is_suggested_under_its_new_name(client, fresh_index):
+    client.post("/artists/create", data=dict(FORM, name="Zephyr Trio"))
+    artist_id = Artist.query.one().id
+    client.post("/artists/%d/edit" % artist_id, data=dict(FORM, name="Aurora Trio"))
+    assert _suggested(client, "trio") == [(ARTIST, "Aurora Trio")]
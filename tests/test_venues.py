@@ -0,0 +1,17 @@
+from benchmarks.datagen import generate
+from fyyur.model import Venue
+
+from .conftest import captured_queries
+
+
+def test_venues_query_count_does_not_grow_with_the_catalogue(app, client):
+    counts = []
+    for scale in (0.1, 1):
+        generate(scale)
+        with captured_queries() as statements:
+            response = client.get("/venues")
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).count('href="/venues/') == Venue.query.count()
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]